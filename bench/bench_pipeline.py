@@ -0,0 +1,183 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import tempfile
+import time
+
+import synthetic
+import lib_database as dbl
+import lib_pdf_image
+from lib_make_excel import AccountBookGenerator, ExpandTreeGenerator
+from lib_shell import Shell
+from lib_thumbnail import ThumbnailCache
+from PIL import Image
+
+repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+period = ['0001-01-01', '9999-12-31']
+months = ['2020-01', '2022-12']  # synthetic.make_file_names 의 기본 기간 (3년)
+daily_headers = ['DATE', 'BRANCH', 'IN', 'OUT', 'BALANCE', 'DESCRIPTION']
+
+
+# func 를 repeat 번 실행 -> {best, median} (s), setup: 매 실행 전 호출 (측정 제외)
+def measure(func, repeat, setup=None):
+    seconds = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        begin = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            func()
+        seconds.append(time.perf_counter() - begin)
+    return {'best': min(seconds), 'median': statistics.median(seconds)}
+
+
+# PDF 용 실제 이미지 (영수증 사진 크기), 파일명은 영수증 형식을 따름
+def make_images(image_dir, file_names):
+    os.makedirs(image_dir, exist_ok=True)
+    base_path = os.path.join(image_dir, 'base.png')
+    Image.radial_gradient('L').resize((1200, 1600)).convert('RGB').save(base_path)
+
+    image_paths = []
+    for file_name in file_names:
+        image_path = os.path.join(image_dir, file_name)
+        shutil.copyfile(base_path, image_path)
+        image_paths.append(image_path)
+    return image_paths
+
+
+# 저장소에 한글 폰트가 없으면 reportlab 내장 폰트로 대체 (배치/그리기 비용 측정에는 무관)
+def select_font():
+    font_path = os.path.join(repo_dir, lib_pdf_image.font_path)
+    if not os.path.exists(font_path):
+        import reportlab
+        font_path = os.path.join(os.path.dirname(reportlab.__file__), 'fonts', 'Vera.ttf')
+    lib_pdf_image.font_path = font_path
+    return os.path.basename(font_path)
+
+
+def run_size(n, args):
+    results = {}
+    with tempfile.TemporaryDirectory() as work_dir:
+        json_tree = synthetic.make_json_tree(args.depth, args.fan_out)
+        synthetic.make_workspace(work_dir, json_tree)
+        paths = synthetic.tree_paths(json_tree)
+        file_names = synthetic.make_file_names(paths, n)
+        for file_name in file_names:
+            open(os.path.join(dbl.folder_path, file_name), 'wb').close()
+
+        # 1. DatabaseController: 빈 DB 구성 (cold) / 변경 없는 재시작 (warm)
+        def remove_db():
+            if os.path.exists(dbl.db_name):
+                os.remove(dbl.db_name)
+
+        results['db_cold'] = measure(lambda: dbl.DatabaseController().database.close(), args.repeat, remove_db)
+        results['db_warm'] = measure(lambda: dbl.DatabaseController().database.close(), args.repeat)
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            shell = Shell()
+        db, branch = shell.db, shell.root
+
+        # 2. 조회 (커서는 끝까지 소비)
+        results['make_daily_box'] = measure(lambda: list(dbl.make_daily_box(branch, db, period)), args.repeat)
+        results['make_monthly_box'] = measure(lambda: dbl.make_monthly_box(branch, db, period), args.repeat)
+        results['refer_tree'] = measure(lambda: shell.refer_tree(['refer', '-t']), args.repeat, shell.query_cache.clear)
+
+        # 3. 엑셀 출력
+        def expand():
+            etg = ExpandTreeGenerator(branch, months)
+            etg.make_account_book(dbl.make_expand_box(branch, db, period), db.branch_ids)
+            etg.make_excel(os.path.join(work_dir, 'expand.xlsx'))
+
+        def account_book():
+            summary = dbl.make_daily_summary(branch, db, period)
+            xl_generator = AccountBookGenerator(dbl.make_daily_box(branch, db, period), daily_headers, summary)
+            xl_generator.make_excel(os.path.join(work_dir, 'daily.xlsx'))
+
+        results['expand_tree'] = measure(expand, args.repeat)
+        results['account_book'] = measure(account_book, args.repeat)
+
+        # 4. 영수증 PDF (이미지 수는 --pdf-images 로 제한), 첫 실행은 썸네일 생성 포함
+        image_paths = make_images(os.path.join(work_dir, 'images'), file_names[:min(n, args.pdf_images)])
+        pdf_path = os.path.join(work_dir, 'receipts.pdf')
+        cache = ThumbnailCache(os.path.join(work_dir, 'datas', 'thumbnails'))  # 규모마다 새 작업 디렉토리
+        results['pdf_cold'] = measure(lambda: lib_pdf_image.generate_image_pdf(image_paths, pdf_path, cache), 1)
+        results['pdf_warm'] = measure(lambda: lib_pdf_image.generate_image_pdf(image_paths, pdf_path, cache), args.repeat)
+        results['pdf_images'] = len(image_paths)
+        results['branches'] = len(paths)
+
+        db.database.close()
+        os.chdir(repo_dir)
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=repo_dir,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(report, baseline=None):
+    for size, results in report['results'].items():
+        print(f'transactions: {int(size):,}, branches: {results["branches"]:,}, pdf images: {results["pdf_images"]}')
+        for stage, value in results.items():
+            if not isinstance(value, dict):
+                continue
+            line = f'{stage:>18}: {value["best"] * 1000:10.1f} ms (median {value["median"] * 1000:10.1f} ms)'
+            old = (baseline or {}).get('results', {}).get(size, {}).get(stage)
+            if old:
+                line += f'  vs {old["best"] * 1000:10.1f} ms -> {old["best"] / value["best"]:5.2f}x'
+            print(line)
+        print()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='whole pipeline on a synthetic ledger: sync, refer, expand, excel, pdf')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000], help='numbers of receipt files')
+    parser.add_argument('--depth', type=int, default=3)
+    parser.add_argument('--fan-out', type=int, default=5)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--pdf-images', type=int, default=100, help='max number of images in the pdf')
+    parser.add_argument('--out', default='bench_pipeline.json', help='json results file')
+    parser.add_argument('--compare', help='previous json results file (speedup = old / new)')
+    args = parser.parse_args()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    out_path = os.path.abspath(args.out)
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'depth': args.depth,
+            'fan_out': args.fan_out,
+            'repeat': args.repeat,
+            'font': select_font(),
+        },
+        'results': {},
+    }
+    for n in args.sizes:
+        report['results'][str(n)] = run_size(n, args)
+
+    with open(out_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    print_results(report, baseline)
+    print(f'saved: {out_path}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+import argparse
+import os
+import tempfile
+import time
+
+import synthetic
+import lib_branch as br
+import lib_database as dbl
+
+
+# 기존 refer -t 방식: 모든 트랜젝션을 불러온 뒤, 경로 문자열을 따라 조상마다 합산
+def legacy_tree_box(branch, db, period):
+    cost_sums = {}
+    subtree, params = dbl.subtree_query(branch, db)
+    db.cursor.execute("SELECT _Branch, _CashFlow" + subtree + " AND ? <= _Date AND _Date <= ?", params + period)
+    for node_path, cost in db.cursor.fetchall():
+        cur_node = branch.path
+        node_box = [cur_node]
+        for node in node_path.split(branch.path)[1].split('/'):
+            if node == '':
+                continue
+            cur_node += '/{}'.format(node)
+            node_box.append(cur_node)
+
+        for cur_node in node_box:
+            sums = cost_sums.setdefault(cur_node, [0, 0])
+            if cost > 0:
+                sums[0] += cost
+            else:
+                sums[1] -= cost
+    return cost_sums
+
+
+def main():
+    parser = argparse.ArgumentParser(description='refer -t: SQL GROUP BY + post-order rollup vs path walking')
+    parser.add_argument('-n', type=int, default=200000, help='number of transactions')
+    parser.add_argument('--depth', type=int, default=4)
+    parser.add_argument('--fan-out', type=int, default=4)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        json_tree = synthetic.make_json_tree(args.depth, args.fan_out)
+        synthetic.make_workspace(work_dir, json_tree)
+        paths = synthetic.tree_paths(json_tree)
+
+        db = dbl.DatabaseController()
+        db.get_data(synthetic.make_file_names(paths, args.n))
+        db.rebuild_rollup()
+        db.database.commit()
+
+        root = br.build_tree_from_json(json_tree)
+        period = ['0000-01-01', '9999-12-31']
+
+        results = {}
+        for name, func in [('legacy', legacy_tree_box), ('group_by', dbl.make_tree_box)]:
+            best = float('inf')
+            for _ in range(args.repeat):
+                begin = time.perf_counter()
+                box = func(root, db, period)
+                best = min(best, time.perf_counter() - begin)
+            results[name] = (best, box)
+
+        legacy, new = results['legacy'][1], results['group_by'][1]
+        assert all(legacy.get(path, [0, 0]) == new[path] for path in new), 'results differ'
+
+        print(f'transactions: {args.n:,}, branches: {len(paths):,}')
+        for name, (best, box) in results.items():
+            print(f'{name:>10}: {best * 1000:10.1f} ms')
+        print(f'   speedup: {results["legacy"][0] / results["group_by"][0]:10.1f}x')
+        db.database.close()
+
+
+if __name__ == '__main__':
+    main()
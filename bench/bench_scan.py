@@ -0,0 +1,54 @@
+import argparse
+import os
+import tempfile
+import time
+
+import synthetic
+import lib_database as dbl
+
+
+def serial_scan(file_names):
+    return dbl.scan_chunk(file_names)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='cold-start scan: serial vs process pool (files/s)')
+    parser.add_argument('-n', type=int, default=300000, help='number of receipt files')
+    parser.add_argument('--workers', type=int, nargs='+', default=[2, 4, os.cpu_count() or 1])
+    parser.add_argument('--chunk-size', type=int, default=dbl.scan_chunk_size)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        json_tree = synthetic.make_json_tree(3, 5)
+        synthetic.make_workspace(work_dir, json_tree)
+        for file_name in synthetic.make_file_names(synthetic.tree_paths(json_tree), args.n):
+            open(os.path.join(dbl.folder_path, file_name), 'wb').close()
+        file_names = os.listdir(dbl.folder_path)
+
+        print(f'files: {len(file_names):,}, cpus: {os.cpu_count()}')
+
+        # 1. 조회 + 파싱
+        begin = time.perf_counter()
+        serial_scan(file_names)
+        seconds = time.perf_counter() - begin
+        print(f'{"serial":>12}: {seconds:7.2f}s {len(file_names) / seconds:12,.0f} files/s')
+
+        for workers in sorted(set(args.workers)):
+            begin = time.perf_counter()
+            dbl.scan_parallel(file_names, workers, args.chunk_size)
+            seconds = time.perf_counter() - begin
+            print(f'{f"{workers} workers":>12}: {seconds:7.2f}s {len(file_names) / seconds:12,.0f} files/s')
+
+        # 2. 빈 DB 전체 구성 (조회 + 파싱 + 단일 연결 삽입)
+        for threshold, label in [(len(file_names) + 1, 'cold serial'), (0, 'cold pool')]:
+            dbl.parallel_threshold = threshold
+            begin = time.perf_counter()
+            db = dbl.DatabaseController(full=True)
+            seconds = time.perf_counter() - begin
+            stats = db.sync_stats
+            print(f'{label:>12}: {seconds:7.2f}s {stats["files_per_sec"]:12,.0f} files/s ({stats["workers"]} worker(s))')
+            db.database.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import synthetic
+
+repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 기존 main.py (from lib_shell import *) 가 프롬프트 전에 불러오던 모듈들
+eager_modules = ['lib_make_excel', 'lib_tree_editor', 'lib_insert_transaction', 'lib_delete_transaction',
+                 'lib_modify_transaction', 'lib_report', 'matplotlib.pyplot']
+heavy_modules = ['matplotlib', 'pandas', 'numpy', 'openpyxl', 'reportlab', 'PIL', 'tkinter', 'keyboard']
+
+
+# 새 프로세스에서 프롬프트 직전(Shell 생성 완료)까지의 시간 (ms) 및 로드된 무거운 모듈 목록
+def measure(work_dir, eager):
+    code = '\n'.join([
+        'import sys, time',
+        'begin = time.perf_counter()',
+        *([f'import {module}' for module in eager_modules] if eager else []),
+        'from lib_shell import Shell, quit_commands',
+        'shell = Shell()',
+        'seconds = time.perf_counter() - begin',
+        f'loaded = [m for m in {heavy_modules!r} if m in sys.modules]',
+        'print(seconds * 1000, ",".join(loaded))',
+    ])
+    env = dict(os.environ, PYTHONPATH=repo_dir)
+    begin = time.perf_counter()
+    output = subprocess.run([sys.executable, '-c', code], cwd=work_dir, env=env, capture_output=True, text=True, check=True).stdout
+    wall = (time.perf_counter() - begin) * 1000
+    ms, _, loaded = output.strip().splitlines()[-1].partition(' ')
+    return float(ms), wall, loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description='cold start: time to first prompt, lazy vs eager imports')
+    parser.add_argument('-n', type=int, default=1000, help='number of receipt files')
+    parser.add_argument('-r', '--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        json_tree = synthetic.make_json_tree(2, 5)
+        synthetic.make_workspace(work_dir, json_tree)
+        for file_name in synthetic.make_file_names(synthetic.tree_paths(json_tree), args.n):
+            open(os.path.join('transactions', file_name), 'wb').close()
+        measure(work_dir, eager=False)  # DB 생성 + 파이썬 캐시 워밍업
+
+        for label, eager in [('lazy', False), ('eager', True)]:
+            results = [measure(work_dir, eager) for _ in range(args.repeat)]
+            prompt_ms = statistics.median(ms for ms, _, _ in results)
+            wall_ms = statistics.median(wall for _, wall, _ in results)
+            print(f'{label:>6}: prompt {prompt_ms:8.1f} ms, process {wall_ms:8.1f} ms, loaded: {results[-1][2] or "-"}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+import json
+import os
+import random
+import sys
+
+# bench/ 에서 실행해도 저장소의 lib_* 모듈을 불러올 수 있도록 설정
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+# 깊이(depth) x 자식 수(fan_out) 의 합성 BudgetTree
+def make_json_tree(depth, fan_out):
+    def make_node(level):
+        if level == depth:
+            return {}
+        return {f'B{level}{i}': make_node(level + 1) for i in range(fan_out)}
+
+    return {'Home': make_node(0)}
+
+
+def tree_paths(json_tree):
+    path_box = []
+
+    def dfs(node, path):
+        path_box.append(path)
+        for child_name in node:
+            dfs(node[child_name], f'{path}/{child_name}')
+
+    for root_name in json_tree:
+        dfs(json_tree[root_name], root_name)
+    return path_box
+
+
+# date_branch_cashflow_desc 형식의 합성 영수증 파일명
+def make_file_names(paths, n, seed=0, years=3):
+    rng = random.Random(seed)
+    file_names = []
+    for i in range(n):
+        _date = f'{2020 + rng.randrange(years)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}'
+        _branch = rng.choice(paths).replace('/', '-')
+        _cashflow = rng.choice([1, -1, -1, -1]) * rng.randint(100, 500000)
+        file_names.append(f"{_date}_{_branch}_{'+' if _cashflow > 0 else ''}{_cashflow}_desc{i}.png")
+    return file_names
+
+
+# 작업 디렉토리에 BudgetTree.json 과 (빈) transactions 폴더 생성
+def make_workspace(work_dir, json_tree):
+    os.makedirs(os.path.join(work_dir, 'transactions'), exist_ok=True)
+    with open(os.path.join(work_dir, 'BudgetTree.json'), 'w', encoding='utf-8') as f:
+        json.dump(json_tree, f, ensure_ascii=False)
+    os.chdir(work_dir)
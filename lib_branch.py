@@ -1,4 +1,3 @@
-from openpyxl import load_workbook
 from collections import deque
 import json, os
 
@@ -45,6 +44,8 @@ class Branch:
 
 
 def build_tree():
+    from openpyxl import load_workbook  # 엑셀 트리 입력 시에만 로드
+
     root = Branch("Home")
     last_nodes = {0: root}  # Dictionary to keep track of the last node at each level
     tree = load_workbook(filename=file_path)['Budget-Tree']
@@ -1,134 +1,673 @@
 import sqlite3
+import calendar
+import hashlib
+import stat
+import time
 import os
-from lib_branch import Branch
-
-import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from lib_branch import Branch, load_tree
+from lib_profiler import ProfiledConnection
+import lib_profiler as profiler
 
 # Class for communicating with SQLite3 SQL database.
 file_path_tree = 'finance-tree.xlsx'
 db_name = 'AccountBook.db'
 table_name = 'expenditures'
+manifest_name = 'manifest'  # 영수증 파일 목록 (파일명, 크기, 수정 시각)
+branch_table_name = 'branches'  # 브랜치 경로 <-> 정수 id
+closure_name = 'branch_closure'  # 조상/자손 브랜치 쌍
+rollup_name = 'monthly_rollup'  # 브랜치(하위 포함) x 월 별 수입/지출 합계
+hash_name = 'receipt_hashes'  # 영수증 이미지 해시 캐시 (sync --full 후에도 유지)
+folder_path = 'transactions'
+schema_version = 6
+perceptual_hash = True  # PIL 사용 가능 시 dHash 도 계산
+rollup_threshold = 1000  # 변경 파일이 이보다 많으면 월별 집계를 통째로 재계산
+parallel_threshold = 50000  # 빈 DB 에서 파일이 이보다 많으면 프로세스 풀로 조회/파싱
+scan_chunk_size = 10000  # 프로세스 풀 작업 단위 (파일 수)
 
 
 class DatabaseController:
-    def __init__(self):
+    def __init__(self, full=False):
         self.db_name = db_name
-        self.database = sqlite3.connect(db_name)
+        self.database = sqlite3.connect(db_name, factory=ProfiledConnection)  # profile on: SQL 문별 시간 기록
         self.cursor = self.database.cursor()
         self.table_name = table_name
-        self.headers = [("_Date", "DATE"), ("_Branch", "STR"), ("_CashFlow", "INT"), ("_Description", "STR")]
-        self.init_database()
-        self.get_data()
-
-    def init_database(self):
-        # 1. Delete all tables in DB
-        self.cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
-        for table in self.cursor.fetchall():
-            self.cursor.execute(f"DROP TABLE {table[0]}")
+        self.headers = [("_Date", "DATE"), ("_Branch", "STR"), ("_CashFlow", "INT"), ("_Description", "STR"), ("_FileName", "STR"), ("_BranchId", "INT")]
+        self.branch_ids = {}  # {브랜치 경로: id}
+        self.sync_stats = {}  # 마지막 동기화 처리량 (파일 수, 소요 시간, files/s)
+        self.generation = 0  # 이 연결의 쓰기마다 증가 -> 조회 결과 캐시 무효화
+        self.init_database(full)
+        self.sync_branches(load_tree())
+        self.synchronize()
+
+    def init_database(self, full=False):
+        # 1. 전체 재구성 요청 또는 스키마 변경 시, DB 의 모든 테이블 삭제 (해시 캐시는 스키마 변경 시에만)
+        self.cursor.execute("PRAGMA user_version;")
+        outdated = self.cursor.fetchone()[0] != schema_version
+        if full or outdated:
+            self.cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
+            for table in self.cursor.fetchall():
+                if outdated or table[0] != hash_name:
+                    self.cursor.execute(f"DROP TABLE {table[0]}")
 
         # 2. Create table
         create_query = f'''CREATE TABLE IF NOT EXISTS {table_name} (
             _Date DATE, 
             _Branch TEXT, 
             _Description TEXT,
-            _CashFlow INT
+            _CashFlow INT,
+            _FileName TEXT,
+            _BranchId INT
+        );'''
+        self.cursor.execute(create_query)
+
+        # 3. Create manifest (파일명, 크기, 수정 시각)
+        create_query = f'''CREATE TABLE IF NOT EXISTS {manifest_name} (
+            _FileName TEXT,
+            _Size INT,
+            _MTime REAL
+        );'''
+        self.cursor.execute(create_query)
+
+        # 4. Create branch table & closure table (조상, 자손, 깊이 차이)
+        create_query = f'''CREATE TABLE IF NOT EXISTS {branch_table_name} (
+            _Id INTEGER PRIMARY KEY,
+            _Path TEXT UNIQUE,
+            _Parent INT
+        );'''
+        self.cursor.execute(create_query)
+
+        create_query = f'''CREATE TABLE IF NOT EXISTS {closure_name} (
+            _Ancestor INT,
+            _Descendant INT,
+            _Depth INT,
+            PRIMARY KEY (_Ancestor, _Descendant)
+        ) WITHOUT ROWID;'''
+        self.cursor.execute(create_query)
+        self.cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_descendant ON {closure_name} (_Descendant);")
+
+        # 5. Create monthly rollup (모든 조상 브랜치에 대해 유지)
+        create_query = f'''CREATE TABLE IF NOT EXISTS {rollup_name} (
+            _BranchId INT,
+            _Month TEXT,
+            _CashIn INT,
+            _CashOut INT,
+            _Count INT,
+            PRIMARY KEY (_BranchId, _Month)
+        ) WITHOUT ROWID;'''
+        self.cursor.execute(create_query)
+
+        # 6. Create hash cache (크기, 수정 시각이 같으면 재계산하지 않음)
+        create_query = f'''CREATE TABLE IF NOT EXISTS {hash_name} (
+            _FileName TEXT PRIMARY KEY,
+            _Size INT,
+            _MTime REAL,
+            _Sha256 TEXT,
+            _PHash TEXT
         );'''
         self.cursor.execute(create_query)
+        self.cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_sha256 ON {hash_name} (_Sha256);")
+        self.cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_phash ON {hash_name} (_PHash);")
+
+        self.create_indexes()
+        self.cursor.execute(f"PRAGMA user_version = {schema_version};")
+        self.database.commit()
+        self.load_branch_ids()
 
+    def create_indexes(self):
         self.cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_date ON {table_name} (_Date);")
-        self.cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_branch ON {table_name} (_Branch);")
+        self.cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_branch ON {table_name} (_BranchId, _Date, _CashFlow);")
+        self.cursor.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS idx_file ON {table_name} (_FileName);")
+        self.cursor.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS idx_manifest ON {manifest_name} (_FileName);")
+
+    # 대량 삽입 시, 인덱스는 삽입 후 한 번에 생성하는 편이 빠름
+    def drop_indexes(self):
+        for index_name in ['idx_date', 'idx_branch', 'idx_file', 'idx_manifest']:
+            self.cursor.execute(f"DROP INDEX IF EXISTS {index_name};")
+
+    def scan_folder(self):
+        file_box = {}
+        os.makedirs(folder_path, exist_ok=True)
+        with os.scandir(folder_path) as entries:
+            for entry in entries:
+                if entry.is_file():
+                    file_stat = entry.stat()
+                    file_box[entry.name] = (file_stat.st_size, file_stat.st_mtime)
+        return file_box
+
+    # BudgetTree.json 의 모든 브랜치를 branches / closure 테이블에 등록
+    def sync_branches(self, json_tree):
+        def dfs(node, path):
+            self.ensure_branch(path)
+            for child_name in node:
+                dfs(node[child_name], f'{path}/{child_name}')
+
+        for root_name in json_tree:
+            dfs(json_tree[root_name], root_name)
+        self.database.commit()
+        self.generation += 1
+
+    # 브랜치 id 반환, 없는 경우 (트리에서 삭제된 브랜치 포함) 조상부터 등록
+    def ensure_branch(self, path):
+        if path in self.branch_ids:
+            return self.branch_ids[path]
+
+        parent_id = self.ensure_branch(path.rsplit('/', 1)[0]) if '/' in path else None
+        self.cursor.execute(f"INSERT OR IGNORE INTO {branch_table_name} (_Path, _Parent) VALUES (?, ?)", (path, parent_id))
+        if self.cursor.rowcount == 0:  # 다른 연결 (폴더 감시 등) 에서 이미 등록한 브랜치
+            self.cursor.execute(f"SELECT _Id FROM {branch_table_name} WHERE _Path = ?", (path,))
+            branch_id = self.cursor.fetchone()[0]
+        else:
+            branch_id = self.cursor.lastrowid
+            self.cursor.execute(f"INSERT INTO {closure_name} VALUES (?, ?, 0)", (branch_id, branch_id))
+            if parent_id is not None:
+                self.cursor.execute(f'''INSERT INTO {closure_name}
+                    SELECT _Ancestor, ?, _Depth + 1 FROM {closure_name} WHERE _Descendant = ?''', (branch_id, parent_id))
+
+        self.branch_ids[path] = branch_id
+        return branch_id
+
+    def load_branch_ids(self):
+        self.cursor.execute(f"SELECT _Path, _Id FROM {branch_table_name}")
+        self.branch_ids = dict(self.cursor.fetchall())
+
+    # 폴더와 manifest 를 비교하여 변경된 파일만 반영
+    def synchronize(self):
+        begin = time.perf_counter()
+
+        try:
+            # 1. 폴더 및 manifest 조회 (빈 DB + 대용량 폴더는 프로세스 풀에서 조회/파싱)
+            self.cursor.execute(f"SELECT _FileName, _Size, _MTime FROM {manifest_name}")
+            manifest = {file_name: (size, mtime) for file_name, size, mtime in self.cursor.fetchall()}
+
+            parsed, workers = None, 1
+            if len(manifest) == 0:
+                os.makedirs(folder_path, exist_ok=True)
+                file_names = os.listdir(folder_path)
+                if len(file_names) >= parallel_threshold and (os.cpu_count() or 1) > 1:
+                    workers = os.cpu_count()
+                    file_box, parsed = scan_parallel(file_names, workers)
+            if parsed is None:
+                file_box = self.scan_folder()
+
+            # 2. 변경 사항 (삭제 / 추가 / 수정 = 삭제 후 추가)
+            removed = [file_name for file_name in manifest if file_box.get(file_name) != manifest[file_name]]
+            added = [file_name for file_name in file_box if manifest.get(file_name) != file_box[file_name]]
+
+            # 3. DB 반영 (단일 트랜잭션, 빈 DB 는 인덱스 없이 삽입 후 재생성)
+            #    조회 이후 다른 연결 (폴더 감시) 이 먼저 반영한 파일이 있을 수 있으므로 추가 파일도 삭제 후 삽입 (refresh 와 동일)
+            cold = len(manifest) == 0
+            bulk = cold or len(added) + len(removed) > rollup_threshold
+            self.remove_data(list(dict.fromkeys(removed + added)), rollup=not bulk)
+            if cold:
+                self.drop_indexes()
+            ingested, rejected = self.add_data(
+                {file_name: file_box[file_name] for file_name in added}, rollup=not bulk, hashing=not bulk, parsed=parsed)
+            if cold:
+                self.create_indexes()
+            if bulk:
+                self.rebuild_rollup()
+            self.database.commit()
+            if removed or added:
+                self.generation += 1
+        except Exception:
+            self.rollback()
+            raise
+
+        seconds = time.perf_counter() - begin
+        if profiler.enabled:
+            profiler.record('db.synchronize', seconds)
+        self.sync_stats = {
+            'ingested': ingested, 'rejected': rejected, 'removed': len(removed),
+            'files': len(file_box), 'workers': workers, 'seconds': seconds,
+            'files_per_sec': len(file_box) / seconds if seconds > 0 else 0
+        }
+        return ingested, rejected, len(removed)
+
+    # 실패한 쓰기 취소 -> 쓰기 잠금을 쥔 채로 남지 않도록, 취소된 브랜치 id 는 DB 에서 다시 읽음
+    def rollback(self):
+        self.database.rollback()
+        self.load_branch_ids()
+
+    # 데이터 버전: (이 연결의 쓰기 횟수, 다른 연결(감시 스레드 등)의 커밋 반영 여부)
+    def data_stamp(self):
+        return self.generation, self.database.execute('PRAGMA data_version').fetchone()[0]
+
+    # 영수증 한 건 저장 (파일 + DB 행)
+    def insert_one(self, image, file_name):
+        file_path = os.path.join(folder_path, file_name)
+        if os.path.exists(file_path):
+            raise FileExistsError(f"'{file_name}' already exists")
+
+        image.save(file_path)
+        try:
+            self.refresh([file_name])
+        except Exception:
+            self.rollback()
+            raise
+
+    # 영수증 한 건 이름 변경 (파일 + DB 행)
+    def rename_one(self, old_file_name, new_file_name):
+        if old_file_name == new_file_name:
+            return
+
+        new_path = os.path.join(folder_path, new_file_name)
+        if os.path.exists(new_path):
+            raise FileExistsError(f"'{new_file_name}' already exists")
+
+        os.rename(os.path.join(folder_path, old_file_name), new_path)
+        try:
+            self.cursor.execute(f"DELETE FROM {hash_name} WHERE _FileName = ?", (new_file_name,))
+            self.cursor.execute(f"UPDATE {hash_name} SET _FileName = ? WHERE _FileName = ?", (new_file_name, old_file_name))
+            self.refresh([old_file_name, new_file_name])
+        except Exception:
+            self.rollback()
+            raise
+
+    # 영수증 한 건 삭제 (파일 + DB 행)
+    def delete_one(self, file_name):
+        os.remove(os.path.join(folder_path, file_name))
+        try:
+            self.refresh([file_name])
+        except Exception:
+            self.rollback()
+            raise
+
+    # 지정한 파일들의 행을 현재 폴더 상태로 교체 (다른 연결이 먼저 반영한 경우에도 안전)
+    def refresh(self, file_names):
+        file_box = {}
+        for file_name in file_names:
+            try:
+                file_box[file_name] = self.stat_file(file_name)
+            except FileNotFoundError:
+                pass
 
+        try:
+            self.remove_data(file_names)
+            ingested, rejected = self.add_data(file_box)
+            self.database.commit()
+        except Exception:
+            self.rollback()
+            raise
+        self.generation += 1
+
+        return ingested, rejected, len(file_names) - len(file_box)
+
+    def stat_file(self, file_name):
+        file_stat = os.stat(os.path.join(folder_path, file_name))
+        return file_stat.st_size, file_stat.st_mtime
+
+    # 파일 행 + manifest 삽입, file_box: {파일명: (크기, 수정 시각)}
+    def add_data(self, file_box, rollup=True, hashing=True, parsed=None):
+        ingested, rejected = self.get_data(list(file_box), parsed)
+        self.cursor.executemany(
+            f"INSERT INTO {manifest_name} (_FileName, _Size, _MTime) VALUES (?, ?, ?)",
+            [(file_name, *file_box[file_name]) for file_name in file_box])
+        if rollup:
+            self.update_rollup(file_box, 1)
+        if hashing:
+            self.update_hashes(file_box)
+        return ingested, rejected
+
+    # 해시 캐시 갱신: 크기/수정 시각이 바뀐 파일만 계산, file_box: {파일명: (크기, 수정 시각)}
+    def update_hashes(self, file_box):
+        value_box = []
+        for file_name, (size, mtime) in file_box.items():
+            self.cursor.execute(f"SELECT _Size, _MTime FROM {hash_name} WHERE _FileName = ?", (file_name,))
+            if self.cursor.fetchone() == (size, mtime):
+                continue
+            try:
+                file_path = os.path.join(folder_path, file_name)
+                value_box.append((file_name, size, mtime, file_sha256(file_path), image_dhash(file_path)))
+            except OSError:
+                pass
+
+        self.cursor.executemany(f"INSERT OR REPLACE INTO {hash_name} VALUES (?, ?, ?, ?, ?)", value_box)
+        return len(value_box)
+
+    # 중복 의심 영수증 목록 [(해시 종류, 해시, [파일명, ...]), ...]
+    def find_duplicates(self):
+        # 1. 대량 동기화로 아직 해시가 없는 파일 계산 (한 번만)
+        self.cursor.execute(f'''SELECT m._FileName, m._Size, m._MTime FROM {manifest_name} m
+            LEFT JOIN {hash_name} h ON h._FileName = m._FileName AND h._Size = m._Size AND h._MTime = m._MTime
+            WHERE h._FileName IS NULL''')
+        self.update_hashes({file_name: (size, mtime) for file_name, size, mtime in self.cursor.fetchall()})
         self.database.commit()
 
-    def get_data(self):
+        # 2. 같은 해시끼리 그룹 (인덱스 정렬 -> O(n log n))
+        duplicates = []
+        for kind, column in [('SHA-256', '_Sha256'), ('dHash', '_PHash')]:
+            self.cursor.execute(f'''SELECT h.{column}, GROUP_CONCAT(h._FileName, '\n') FROM {hash_name} h
+                JOIN {manifest_name} m ON h._FileName = m._FileName AND h._Size = m._Size AND h._MTime = m._MTime
+                WHERE h.{column} IS NOT NULL
+                GROUP BY h.{column} HAVING COUNT(*) > 1''')
+            for digest, file_names in self.cursor.fetchall():
+                duplicates.append((kind, digest, sorted(file_names.split('\n'))))
+
+        # 바이트 단위로 같은 파일은 dHash 그룹에서 제외
+        exact = {tuple(file_names) for kind, digest, file_names in duplicates if kind == 'SHA-256'}
+        return [row for row in duplicates if row[0] == 'SHA-256' or tuple(row[2]) not in exact]
+
+    def remove_data(self, file_names, rollup=True):
+        if rollup:
+            self.update_rollup(file_names, -1)
+        params = [(file_name,) for file_name in file_names]
+        self.cursor.executemany(f"DELETE FROM {table_name} WHERE _FileName = ?", params)
+        self.cursor.executemany(f"DELETE FROM {manifest_name} WHERE _FileName = ?", params)
+
+    # 파일 단위 월별 집계 갱신 (sign: 1 = 추가, -1 = 삭제), 해당 행이 DB 에 있는 동안 호출
+    def update_rollup(self, file_names, sign):
+        sql_query = f'''INSERT INTO {rollup_name} (_BranchId, _Month, _CashIn, _CashOut, _Count)
+            SELECT _Ancestor, STRFTIME('%Y-%m', _Date), ? * MAX(_CashFlow, 0), ? * MIN(_CashFlow, 0), ?
+            FROM {table_name} JOIN {closure_name} ON _Descendant = _BranchId
+            WHERE _FileName = ? AND STRFTIME('%Y-%m', _Date) IS NOT NULL
+            ON CONFLICT (_BranchId, _Month) DO UPDATE SET
+                _CashIn = _CashIn + excluded._CashIn,
+                _CashOut = _CashOut + excluded._CashOut,
+                _Count = _Count + excluded._Count'''
+        self.cursor.executemany(sql_query, [(sign, sign, sign, file_name) for file_name in file_names])
+        if sign < 0:
+            self.cursor.execute(f"DELETE FROM {rollup_name} WHERE _Count = 0")
+
+    # 월별 집계 전체 재계산 (브랜치 x 월 단위로 먼저 합산 후 조상에 전파)
+    def rebuild_rollup(self):
+        self.cursor.execute(f"DELETE FROM {rollup_name}")
+        self.cursor.execute(f'''INSERT INTO {rollup_name} (_BranchId, _Month, _CashIn, _CashOut, _Count)
+            SELECT _Ancestor, MONTHLY, SUM(CASH_IN), SUM(CASH_OUT), SUM(COUNT)
+            FROM (
+                SELECT _BranchId, STRFTIME('%Y-%m', _Date) AS MONTHLY,
+                    SUM(MAX(_CashFlow, 0)) AS CASH_IN, SUM(MIN(_CashFlow, 0)) AS CASH_OUT, COUNT(*) AS COUNT
+                FROM {table_name}
+                GROUP BY _BranchId, MONTHLY
+            ) JOIN {closure_name} ON _Descendant = _BranchId
+            WHERE MONTHLY IS NOT NULL
+            GROUP BY _Ancestor, MONTHLY''')
+
+    # 파일명 목록을 한 번에 삽입 (commit 은 호출자가 수행), parsed: 미리 파싱된 {파일명: 행}
+    def get_data(self, file_names, parsed=None):
+        value_box, rejected = [], 0
+        for file_name in file_names:
+            row = parsed[file_name] if parsed is not None else parse_file_name(file_name)
+            if row is None:
+                rejected += 1
+            else:
+                value_box.append((*row, self.ensure_branch(row[1])))
+
+        columns = [col for col, col_type in self.headers]
+        sql_query = f"INSERT INTO {table_name} ({','.join(columns)}) VALUES ({','.join(['?'] * len(columns))})"
+        self.cursor.executemany(sql_query, value_box)
+
+        return len(value_box), rejected
+
+
+# 파일명 -> (_Date, _Branch, _CashFlow, _Description, _FileName), 형식이 잘못된 경우 None
+def parse_file_name(file_name):
+    info_txt = os.path.splitext(file_name)[0]
+    info = info_txt.split('_')
+    if len(info) != 4:
+        return None
+
+    _date, _branch, _cashflow, _content = info
+    try:
+        _cashflow = int(_cashflow)
+    except ValueError:
+        return None
+
+    return _date, _branch.replace('-', '/'), _cashflow, _content, file_name
+
+
+def file_sha256(file_path):
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+# 지각 해시 (dHash 64bit), PIL 이 없거나 이미지가 아닌 경우 None
+def image_dhash(file_path, size=8):
+    if not perceptual_hash:
+        return None
+    try:
+        from PIL import Image
+        with Image.open(file_path) as img:
+            img.draft('L', (size * 8, size * 8))  # JPEG 은 축소 디코딩
+            pixels = list(img.convert('L').resize((size + 1, size)).getdata())
+    except Exception:
+        return None
+
+    bits = 0
+    for row in range(size):
+        for col in range(size):
+            bits = (bits << 1) | (pixels[row * (size + 1) + col] > pixels[row * (size + 1) + col + 1])
+    return f'{bits:016x}'
+
+
+# 파일명 일부를 조회(stat) 및 파싱, 프로세스 풀의 작업 단위
+def scan_chunk(file_names):
+    file_box, parsed = {}, {}
+    for file_name in file_names:
         try:
-            os.makedirs('transactions', exist_ok=True)
-            for file_name in os.listdir('transactions'):
-                try:
-                    sql_query = f"INSERT INTO {table_name}"
-                    sql_query += " ({})".format(",".join([col for col, col_type in self.headers]))
+            file_stat = os.stat(os.path.join(folder_path, file_name))
+        except OSError:
+            continue
+        if stat.S_ISREG(file_stat.st_mode):
+            file_box[file_name] = (file_stat.st_size, file_stat.st_mtime)
+            parsed[file_name] = parse_file_name(file_name)
+    return file_box, parsed
+
+
+# 파일 목록을 나눠 프로세스 풀에서 조회/파싱, 결과는 호출한 (단일) DB 연결에서 삽입
+def scan_parallel(file_names, workers=None, chunk_size=scan_chunk_size):
+    chunks = [file_names[i:i + chunk_size] for i in range(0, len(file_names), chunk_size)]
+    file_box, parsed = {}, {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for chunk_box, chunk_parsed in executor.map(scan_chunk, chunks):
+            file_box.update(chunk_box)
+            parsed.update(chunk_parsed)
+    return file_box, parsed
+
+
+# 브랜치 하위 트리 (자신 포함) 조회: closure 테이블과 인덱스 join
+def subtree_query(branch: Branch, db: DatabaseController):
+    from_query = f" FROM {closure_name} JOIN {db.table_name} ON _BranchId = _Descendant"
+    where_query = " WHERE _Ancestor = ?"
+    return from_query + where_query, [db.branch_ids.get(branch.path)]
+
+
+# limit/offset: 페이지 조회 (limit=-1: 전체), 같은 날짜는 파일명 순 -> 페이지 간 순서 고정
+def make_daily_box(branch: Branch, db: DatabaseController, period: list, limit=-1, offset=0):
+    select_query = "SELECT _Date AS DATE, _Branch, _CashFlow, _Description"
+    subtree, params = subtree_query(branch, db)
+
+    begin_date, end_date = period
+    where_query = " AND (_Date BETWEEN ? AND ?)"
+    order_query = " ORDER BY _Date, _FileName LIMIT ? OFFSET ?;"
+
+    sql_query = select_query + subtree + where_query + order_query
+
+    # 별도 커서로 반환 -> 호출자가 행 단위로 스트리밍
+    return db.database.execute(sql_query, params + [begin_date, end_date, limit, offset])
 
-                    value_box = []
-                    info_txt = file_name.split('.')[0]
-                    _date, _branch, _cashflow, _content = info_txt.split('_')
 
-                    # Date
-                    value_box.append(f"'{_date}'")
+# make_daily_box 의 앞쪽 offset 개 행의 잔액 합계 (페이지 조회 시 누적 잔액 시작값)
+def make_daily_balance(branch: Branch, db: DatabaseController, period: list, offset: int):
+    if offset <= 0:
+        return 0
+
+    subtree, params = subtree_query(branch, db)
+    begin_date, end_date = period
+    sql_query = f"""SELECT COALESCE(SUM(_CashFlow), 0) FROM (
+        SELECT _CashFlow {subtree} AND (_Date BETWEEN ? AND ?) ORDER BY _Date, _FileName LIMIT ?)"""
+    db.cursor.execute(sql_query, params + [begin_date, end_date, offset])
+    return db.cursor.fetchone()[0]
 
-                    # Branch
-                    value_box.append(f"'{_branch.replace('-', '/')}'")
 
-                    # Transaction
-                    value_box.append(f'{int(_cashflow)}')
+# 일별 장부 요약 (건수, 수입/지출 합계, 브랜치/내역 최대 길이) 을 한 번의 집계로 조회
+def make_daily_summary(branch: Branch, db: DatabaseController, period: list):
+    # *_BYTES: UTF-8 길이 -> 터미널 표시 폭(한글 2칸)의 상한
+    select_query = '''SELECT COUNT(*), SUM(MAX(_CashFlow, 0)), -SUM(MIN(_CashFlow, 0)),
+        MAX(LENGTH(_Branch)), MAX(LENGTH(_Description)),
+        MAX(LENGTH(CAST(_Branch AS BLOB))), MAX(LENGTH(CAST(_Description AS BLOB)))'''
+    subtree, params = subtree_query(branch, db)
 
-                    # Content
-                    value_box.append(f"'{_content}'")
-                    sql_query += " VALUES({})".format(",".join(value_box))
-                    self.cursor.execute(sql_query)
-                    self.database.commit()
-                except Exception as e:
-                    pass
+    begin_date, end_date = period
+    where_query = " AND (_Date BETWEEN ? AND ?)"
 
-        except:
-            pass
+    db.cursor.execute(select_query + subtree + where_query, params + [begin_date, end_date])
+    count, total_in, total_out, branch_len, desc_len, branch_bytes, desc_bytes = db.cursor.fetchone()
+    return {'COUNT': count, 'IN': total_in or 0, 'OUT': total_out or 0, 'BRANCH': branch_len or 0, 'DESCRIPTION': desc_len or 0,
+            'BRANCH_BYTES': branch_bytes or 0, 'DESCRIPTION_BYTES': desc_bytes or 0}
 
-        return
 
+# 기간 내 첫/마지막 거래일
+def make_date_bounds(branch: Branch, db: DatabaseController, period: list):
+    subtree, params = subtree_query(branch, db)
+    begin_date, end_date = period
+    db.cursor.execute("SELECT MIN(_Date), MAX(_Date)" + subtree + " AND (_Date BETWEEN ? AND ?)", params + [begin_date, end_date])
+    return db.cursor.fetchone()
 
-def make_daily_box(branch: Branch, db: DatabaseController, period: list):
-    select_query = f"SELECT _Date AS DATE, _Branch, _CashFlow, _Description FROM {db.table_name}"
-    where_query = " WHERE _Branch LIKE '{}%'".format(branch.path)
 
+# 보고서용 거래 목록, 첫 열은 기간 그룹 번호 (interval: ('day' | 'month', n), begin_date 부터 n일/n개월 단위)
+def make_report_box(branch: Branch, db: DatabaseController, period: list, interval: tuple):
     begin_date, end_date = period
-    where_query += " AND (_Date BETWEEN '{}' AND '{}')".format(begin_date, end_date)
+    unit, n = interval
+    if unit == 'month':
+        begin_y, begin_m = map(int, begin_date.split('-')[:2])
+        bucket_query = "(CAST(SUBSTR(_Date, 1, 4) AS INTEGER) * 12 + CAST(SUBSTR(_Date, 6, 2) AS INTEGER) - ?) / ?"
+        bucket_params = [begin_y * 12 + begin_m, n]
+    else:
+        bucket_query = "CAST(JULIANDAY(_Date) - JULIANDAY(?) AS INTEGER) / ?"
+        bucket_params = [begin_date, n]
+
+    select_query = f"SELECT {bucket_query} AS _Bucket, _Date, _Branch, _CashFlow, _Description, _FileName"
+    subtree, params = subtree_query(branch, db)
+    where_query = " AND (_Date BETWEEN ? AND ?) AND _Bucket IS NOT NULL"
     order_query = " ORDER BY _Date;"
 
-    sql_query = select_query + where_query + order_query
-    db.cursor.execute(sql_query)
+    sql_query = select_query + subtree + where_query + order_query
+    return db.database.execute(sql_query, bucket_params + params + [begin_date, end_date])
 
-    return db.cursor.fetchall()
+
+# 브랜치 x 월 단위 집계 (_BranchId, 월 번호(년*12 + 월 - 1), 수입 합계, 지출 합계(음수))
+def make_expand_box(branch: Branch, db: DatabaseController, period: list):
+    select_query = '''SELECT _BranchId, CAST(SUBSTR(_Date, 1, 4) AS INTEGER) * 12 + CAST(SUBSTR(_Date, 6, 2) AS INTEGER) - 1
+        AS MONTHLY, SUM(MAX(_CashFlow, 0)), SUM(MIN(_CashFlow, 0))'''
+    subtree, params = subtree_query(branch, db)
+
+    begin_date, end_date = period
+    where_query = " AND (_Date BETWEEN ? AND ?)"
+    group_query = " GROUP BY _BranchId, MONTHLY;"
+
+    db.cursor.execute(select_query + subtree + where_query + group_query, params + [begin_date, end_date])
+    res = db.cursor.fetchall()
+    known_ids = set(db.branch_ids.values())
+    if any(row[0] not in known_ids for row in res):  # 다른 연결에서 추가된 브랜치 -> db.branch_ids 로 경로 조회 가능하도록
+        db.load_branch_ids()
+    return res
 
 
 def make_monthly_box(branch: Branch, db: DatabaseController, period: list):
     begin_date, end_date = period
-    select_query = f'''SELECT 
+    first_month, last_month = full_months(begin_date, end_date)
+    monthly = {}
+
+    # 1. 월 전체가 기간에 포함되는 경우 -> monthly_rollup 조회
+    select_query = f"SELECT _Month, _CashIn, _CashOut FROM {rollup_name}"
+    where_query = " WHERE _BranchId = ? AND (_Month BETWEEN ? AND ?)"
+    db.cursor.execute(select_query + where_query, [db.branch_ids.get(branch.path), first_month, last_month])
+    for month, cash_in, cash_out in db.cursor.fetchall():
+        monthly[month] = [cash_in, cash_out]
+
+    # 2. 기간 양 끝의 일부만 포함된 월 -> 원본 행 집계
+    select_query = '''SELECT 
         STRFTIME('%Y-%m', _Date) AS MONTHLY, 
         SUM(CASE WHEN _CashFlow > 0 THEN _CashFlow ELSE 0 END) AS CASH_IN,
-        SUM(CASE WHEN _CashFlow < 0 THEN _CashFlow ELSE 0 END) AS CASH_OUT
-    FROM {db.table_name}'''
+        SUM(CASE WHEN _CashFlow < 0 THEN _CashFlow ELSE 0 END) AS CASH_OUT'''
+    subtree, params = subtree_query(branch, db)
 
     # 기간 설정
-    where_query = "\n   WHERE _Branch LIKE '{}%'".format(branch.path)
-    where_query += " AND (_Date BETWEEN '{}' AND '{}')".format(begin_date, end_date)
+    where_query = " AND (_Date BETWEEN ? AND ?) AND (_Date < ? OR _Date > ?)"
 
     # SQL: GROUP
-    group_query = " GROUP BY MONTHLY"
-
-    # SQL: ORDER
-    order_query = " ORDER BY MONTHLY;"
+    group_query = " GROUP BY MONTHLY;"
 
     # SQL 실행
-    sql_query = select_query + where_query + group_query + order_query
-    db.cursor.execute(sql_query)
-    return db.cursor.fetchall()
+    sql_query = select_query + subtree + where_query + group_query
+    db.cursor.execute(sql_query, params + [begin_date, end_date, f'{first_month}-01', f'{last_month}-32'])
+    for month, cash_in, cash_out in db.cursor.fetchall():
+        monthly[month] = [cash_in, cash_out]
 
+    return [(month, *monthly[month]) for month in sorted(monthly, key=str)]
 
-def make_graph_box(branch: Branch, db: DatabaseController, period: list, data_type: str = 'BALANCE'):
-    # SQL 쿼리 조건 구성
-    begin_date, end_date = period
-    path = branch.path
 
-    where_query = f" WHERE _Branch LIKE '{path}%' AND (_Date BETWEEN '{begin_date}' AND '{end_date}')"
+def make_graph_box(branch: Branch, db: DatabaseController, period: list, data_type: str = 'BALANCE'):
+    monthly_box = make_monthly_box(branch, db, period)
 
-    # SQL 쿼리 선택 구성
     if data_type == 'BALANCE':
-        select_query = f"SELECT STRFTIME('%Y-%m', _Date) AS MONTHLY, SUM(CASE WHEN _CashFlow > 0 THEN _CashFlow ELSE 0 END) AS CASH_IN, SUM(CASE WHEN _CashFlow < 0 THEN _CashFlow ELSE 0 END) AS CASH_OUT"
+        return monthly_box
+    elif data_type == 'IN':
+        return [(month, cash_in) for month, cash_in, cash_out in monthly_box]
     else:
-        column = 'CASH_IN' if data_type == 'IN' else 'CASH_OUT'
-        sign = '>' if data_type == 'IN' else '<'
-        select_query = f"SELECT STRFTIME('%Y-%m', _Date) AS MONTHLY, SUM(CASE WHEN _CashFlow {sign} 0 THEN _CashFlow ELSE 0 END) AS {column}"
-
-    # SQL 쿼리 실행 및 데이터 처리
-    sql_query = f"{select_query} FROM {db.table_name}{where_query} GROUP BY MONTHLY ORDER BY MONTHLY;"
-    db.cursor.execute(sql_query)
-    return db.cursor.fetchall()
+        return [(month, cash_out) for month, cash_in, cash_out in monthly_box]
+
+
+# 브랜치 트리의 각 노드 별 [수입, 지출] 합계 (하위 브랜치 포함)
+def make_tree_box(branch: Branch, db: DatabaseController, period: list):
+    begin_date, end_date = period
+
+    # 1. SQL: 브랜치 단위 합계 (idx_branch 커버링 인덱스만 조회)
+    subtree, params = subtree_query(branch, db)
+    sql_query = "SELECT _Descendant, SUM(MAX(_CashFlow, 0)), -SUM(MIN(_CashFlow, 0))" + subtree
+    sql_query += " AND ? <= _Date AND _Date <= ? GROUP BY _Descendant"
+    db.cursor.execute(sql_query, params + [begin_date, end_date])
+    res = db.cursor.fetchall()
+    branch_paths = {branch_id: path for path, branch_id in db.branch_ids.items()}
+    if any(branch_id not in branch_paths for branch_id, _, _ in res):  # 다른 연결에서 추가된 브랜치
+        db.load_branch_ids()
+        branch_paths = {branch_id: path for path, branch_id in db.branch_ids.items()}
+    branch_sums = {branch_paths[branch_id]: [cash_in, cash_out] for branch_id, cash_in, cash_out in res}
+
+    # 2. 트리에 없는 브랜치 (삭제된 브랜치 등) 는 가장 가까운 조상 브랜치에 합산
+    tree_paths = set()
+    queue = [branch]
+    while queue:
+        node = queue.pop()
+        tree_paths.add(node.path)
+        queue.extend(node.children.values())
+
+    cost_sums = {path: [0, 0] for path in tree_paths}
+    for path, (cash_in, cash_out) in branch_sums.items():
+        while path not in tree_paths and '/' in path:
+            path = path.rsplit('/', 1)[0]
+        if path in cost_sums:
+            cost_sums[path][0] += cash_in
+            cost_sums[path][1] += cash_out
+
+    # 3. 후위 순회로 자식 합계를 부모에 누적
+    def dfs(node):
+        for child in node.children.values():
+            child_in, child_out = dfs(child)
+            cost_sums[node.path][0] += child_in
+            cost_sums[node.path][1] += child_out
+        return cost_sums[node.path]
+
+    dfs(branch)
+    return cost_sums
+
+
+# 기간 내에 통째로 포함되는 첫 월과 마지막 월 (YYYY-MM), 없는 경우 첫 월 > 마지막 월
+def full_months(begin_date, end_date):
+    first_y, first_m = int(begin_date[:4]), int(begin_date[5:7])
+    if begin_date[8:] > '01':
+        first_y, first_m = (first_y, first_m + 1) if first_m < 12 else (first_y + 1, 1)
+
+    last_y, last_m = int(end_date[:4]), int(end_date[5:7])
+    try:
+        last_day = calendar.monthrange(last_y, last_m)[1]
+    except ValueError:
+        last_day = 31
+    if end_date[8:] < f'{last_day:02d}':
+        last_y, last_m = (last_y, last_m - 1) if last_m > 1 else (last_y - 1, 12)
+
+    return f'{first_y:04d}-{first_m:02d}', f'{last_y:04d}-{last_m:02d}'
@@ -12,9 +12,9 @@ from tkinter import messagebox
 import lib_sanitizer as Df
 
 class TransactionController:
-    def __init__(self, sync_function, branch_path='Home'):
+    def __init__(self, db, branch_path='Home'):
         self.branch_path = branch_path  # 브랜치 경로
-        self.sync = sync_function  # 동기화 함수
+        self.db = db  # 트랜잭션 저장소 (DatabaseController)
         self.root = tk.Tk()  # 메인 윈도우
 
         try:
@@ -65,8 +65,7 @@ class TransactionController:
         floating_message = f"Are you sure you want to delete this row?\n\n{info_txt}"
         if messagebox.askyesno("Delete", floating_message):
             try:
-                os.remove(f'transactions/{file_name}')
-                self.sync()
+                self.db.delete_one(file_name)
                 self.update_table()
             except:
                 pass
@@ -151,5 +150,5 @@ def get_paths():
     dfs(root, deque([]))
     return path_box
 
-def delete_transaction(sync, branch):
-    TransactionController(sync, branch)
\ No newline at end of file
+def delete_transaction(db, branch):
+    TransactionController(db, branch)
\ No newline at end of file
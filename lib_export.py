@@ -0,0 +1,70 @@
+import csv
+import os
+
+export_chunk_size = 50000  # 커서에서 한 번에 가져오는 행 수 -> 메모리 사용량 상한
+export_formats = {'csv', 'parquet'}
+
+
+# rows: DB 커서 또는 행 목록, 반환: 기록한 행 수
+def export_rows(rows, headers, file_path, file_format='csv', chunk_size=export_chunk_size):
+    if file_format == 'parquet':
+        return export_parquet(rows, headers, file_path, chunk_size)
+    return export_csv(rows, headers, file_path, chunk_size)
+
+
+def iter_chunks(rows, chunk_size):
+    if hasattr(rows, 'fetchmany'):
+        while True:
+            chunk = rows.fetchmany(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+    else:
+        for i in range(0, len(rows), chunk_size):
+            yield rows[i:i + chunk_size]
+
+
+def export_csv(rows, headers, file_path, chunk_size=export_chunk_size):
+    count = 0
+    # utf-8-sig: 엑셀에서 열어도 한글이 깨지지 않도록 BOM 포함
+    with open(file_path, 'w', encoding='utf-8-sig', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(headers)
+        for chunk in iter_chunks(rows, chunk_size):
+            writer.writerows(chunk)
+            count += len(chunk)
+    return count
+
+
+# pyarrow 가 설치된 경우에만 사용 가능
+def export_parquet(rows, headers, file_path, chunk_size=export_chunk_size):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Parquet export requires pyarrow (pip install pyarrow)")
+
+    count, writer = 0, None
+    try:
+        for chunk in iter_chunks(rows, chunk_size):
+            if writer is None:  # 첫 청크에서 스키마 추론, 이후 청크는 같은 타입으로 변환 (추론 비용 제거)
+                table = pa.Table.from_arrays([pa.array(column) for column in zip(*chunk)], names=headers)
+                writer = pq.ParquetWriter(file_path, table.schema)
+            else:
+                columns = [pa.array(column, type=field.type) for column, field in zip(zip(*chunk), writer.schema)]
+                table = pa.Table.from_arrays(columns, schema=writer.schema)
+            writer.write_table(table)
+            count += len(chunk)
+
+        # 행이 없는 경우에도 헤더만 있는 파일 생성
+        if writer is None:
+            schema = pa.schema([(header, pa.string()) for header in headers])
+            writer = pq.ParquetWriter(file_path, schema)
+    except Exception:
+        if writer is not None:
+            writer.close()
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        raise
+    writer.close()
+    return count
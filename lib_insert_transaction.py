@@ -8,8 +8,8 @@ import os
 
 
 class ImageSaver:
-    def __init__(self, sync_function, branch_path='Home'):
-        self.sync = sync_function  # 동기화 함수
+    def __init__(self, db, branch_path='Home'):
+        self.db = db  # 트랜잭션 저장소 (DatabaseController)
         self.branch_path = branch_path  # 현재 브랜치 경로
         self.root = tk.Tk()  # 메인 윈도우
 
@@ -179,10 +179,8 @@ class ImageSaver:
                 if self.file_path:
                     self.img = Image.open(self.file_path)
 
-                save_path = f"transactions/{info['tag']}.png"
-                self.img.save(save_path)
+                self.db.insert_one(self.img, f"{info['tag']}.png")
                 self.root.destroy()
-                self.sync()
                 messagebox.showinfo("Success", "Data saved successfully")
             except Exception as e:
                 messagebox.showinfo("Fail", str(e)+'fuck you')
@@ -1,29 +1,36 @@
 from datetime import datetime, timedelta
 from lib_branch import Branch
-from openpyxl.styles import Font, Alignment, Border, Side, PatternFill
-from openpyxl.utils.dataframe import dataframe_to_rows
+from openpyxl.styles import Font, Alignment, Border, Side, PatternFill, NamedStyle
+from openpyxl.utils import get_column_letter
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.workbook import Workbook
 from lib_sanitizer import format_cost
 from collections import deque
 
 import os
 import lib_sanitizer as Df
-import pandas as pd
+import numpy as np
+from lib_profiler import timer
 
 
 class AccountBookGenerator:
-    def __init__(self, data, headers):
+    # data: DB 커서 또는 행 목록 (한 번만 순회), summary: 열 너비 계산용 합계/최대 길이 (없으면 data 에서 계산)
+    def __init__(self, data, headers, summary=None):
         self.count = 0
         self.headers = headers
-        self.data_for_excel = []
-        self.reformat_data(data)
-
-    def reformat_data(self, data):
+        self.data = data
+        if summary is None:
+            self.data = list(data)
+            summary = summarize_rows(self.data, headers)
+        self.summary = summary
+
+    # 엑셀 행 생성 (마지막 행: Total)
+    def reformat_data(self):
         total_in, total_out = 0, 0
         if len(self.headers) == 6:  # Daily Report
-            for row in data:
+            for row in self.data:
                 self.count += 1
-                r_date, r_branch, r_cashflow, r_desc = row
+                r_date, r_branch, r_cashflow, r_desc = row[:4]
                 r_date = r_date.split()[0]
 
                 _in = Df.format_cost(r_cashflow) if r_cashflow > 0 else '-'
@@ -33,13 +40,11 @@ class AccountBookGenerator:
                 total_out += -min(r_cashflow, 0)
 
                 balance = total_in - total_out
-                new_row = (r_date, r_branch, _in, _out, Df.format_cost(balance), r_desc)
-                self.data_for_excel.append(new_row)
+                yield (r_date, r_branch, _in, _out, Df.format_cost(balance), r_desc)
             balance = total_in - total_out
-            total_row = ('Total', '', Df.format_cost(total_in), Df.format_cost(total_out), Df.format_cost(balance), '')
-            self.data_for_excel.append(total_row)
+            yield ('Total', '', Df.format_cost(total_in), Df.format_cost(total_out), Df.format_cost(balance), '')
         elif len(self.headers) == 4:  # Monthly Report
-            for row in data:
+            for row in self.data:
                 monthly, _in, _out = row
                 total_in += _in
                 total_out += -_out
@@ -48,51 +53,93 @@ class AccountBookGenerator:
                 _in = Df.format_cost(_in) if _in != 0 else '-'
                 _out = Df.format_cost(-_out) if _out != 0 else '-'
 
-                new_row = (monthly, _in, _out, Df.format_cost(balance))
-                self.data_for_excel.append(new_row)
+                yield (monthly, _in, _out, Df.format_cost(balance))
 
             balance = total_in - total_out
-            total_row = ('Total', Df.format_cost(total_in), Df.format_cost(total_out), Df.format_cost(balance))
-            self.data_for_excel.append(total_row)
-
-    def make_excel(self, file_path):  # 엑셀 파일 출력
+            yield ('Total', Df.format_cost(total_in), Df.format_cost(total_out), Df.format_cost(balance))
+
+    # 열 너비: 값의 최대 길이 * 1.5 (최소 12), 금액 열은 합계로 상한 추정
+    def column_widths(self):
+        max_cost = max(self.summary['IN'], self.summary['OUT'])
+        lengths = {
+            'DATE': 10, 'MONTHLY': 7,
+            'BRANCH': self.summary.get('BRANCH', 0),
+            'IN': len(format_cost(self.summary['IN'])),
+            'OUT': len(format_cost(self.summary['OUT'])),
+            'BALANCE': len(format_cost(-max_cost)),
+            'DESCRIPTION': self.summary.get('DESCRIPTION', 0)
+        }
+        return [max(max(lengths.get(header, 0), len(header), len('Total')) * 1.5, 12) for header in self.headers]
+
+    def make_excel(self, file_path):  # 엑셀 파일 출력 (write-only 스트리밍)
         try:
-            df = pd.DataFrame(self.data_for_excel, columns=self.headers)
-            wb = Workbook()
-            ws = wb.active
-            width_size = [12] * len(self.headers)  # [12, 12, 12, 12, 12, 12]
-
-            # add data frame onto Excel worksheet.
-            for r_idx, row in enumerate(dataframe_to_rows(df, index=False, header=True)):
-                for c_idx, value in enumerate(row):
-                    cell = ws.cell(row=r_idx + 1, column=c_idx + 1, value=value)
-                    cell.alignment = Alignment(horizontal="center", vertical="center")
-
-                    # styling headers
-                    if r_idx == 0:
-                        cell.font = Font(bold=True)
-                        cell.alignment = Alignment(horizontal="center")
-
-                    # styling total row
-                    if r_idx == len(df):
-                        cell.font = Font(underline="single")
-                        cell.border = Border(bottom=Side(style='thin'))
-
-                    # modify cell's width
-                    width_size[c_idx] = max(len(str(value)) * 1.5, width_size[c_idx])
-                    column_width = width_size[c_idx]
-                    ws.column_dimensions[cell.column_letter].width = column_width
+            with timer('excel.setup'):
+                wb = Workbook(write_only=True)
+                ws = wb.create_sheet()
+                add_named_styles(wb)
+
+                # 열 너비는 첫 행 기록 전에 설정
+                for c_idx, width in enumerate(self.column_widths()):
+                    ws.column_dimensions[get_column_letter(c_idx + 1)].width = width
+
+            # 행 단위 기록 (DB 커서 읽기 포함), 마지막 (Total) 행은 한 행 늦게 기록하여 스타일 구분
+            with timer('excel.rows'):
+                # styling headers
+                ws.append([styled_cell(ws, header, 'book_header') for header in self.headers])
+
+                previous = None
+                for row in self.reformat_data():
+                    if previous is not None:
+                        ws.append([styled_cell(ws, value, 'book_body') for value in previous])
+                    previous = row
+
+                # styling total row
+                ws.append([styled_cell(ws, value, 'book_total') for value in previous])
 
             # save file
-            wb.save(file_path)
+            with timer('excel.save'):
+                wb.save(file_path)
 
             # Success Message
             print(f"Excel file successfully saved as {file_path}")
             print('...')
+            return True
         except Exception as e:
             print('!Error:', e, 345)
             print('...')
-            return
+            return False
+
+
+# 워크북 당 한 번 등록하여 모든 셀이 공유하는 스타일
+def add_named_styles(wb):
+    center = Alignment(horizontal="center", vertical="center")
+    wb.add_named_style(NamedStyle(name='book_header', font=Font(bold=True), alignment=Alignment(horizontal="center")))
+    wb.add_named_style(NamedStyle(name='book_body', alignment=center))
+    wb.add_named_style(NamedStyle(
+        name='book_total', font=Font(underline="single"), border=Border(bottom=Side(style='thin')), alignment=center))
+
+
+def styled_cell(ws, value, style_name):
+    cell = WriteOnlyCell(ws, value=value)
+    cell.style = style_name
+    return cell
+
+
+# 열 너비 계산용 요약 (make_daily_summary 와 같은 형식)
+def summarize_rows(data, headers):
+    summary = {'IN': 0, 'OUT': 0, 'BRANCH': 0, 'DESCRIPTION': 0}
+    if len(headers) == 6:
+        for row in data:
+            r_date, r_branch, r_cashflow, r_desc = row[:4]
+            summary['IN'] += max(r_cashflow, 0)
+            summary['OUT'] += -min(r_cashflow, 0)
+            summary['BRANCH'] = max(summary['BRANCH'], len(str(r_branch)))
+            summary['DESCRIPTION'] = max(summary['DESCRIPTION'], len(str(r_desc)))
+    elif len(headers) == 4:
+        for monthly, _in, _out in data:
+            summary['IN'] += _in
+            summary['OUT'] += -_out
+    return summary
 
 
 from lib_sanitizer import format_month
@@ -112,9 +159,14 @@ class ExpandTreeGenerator:
         self.make_period(period)
 
         self.root = branch
-        self.account_book = {}
+        self.paths, self.parents, self.depths = [], [], []
         self.dfs_make_list()
 
+        # (branch_id, month_index) 행렬, 마지막 열: Sum
+        self.index = {path: i for i, path in enumerate(self.paths)}
+        self.cash_in = np.zeros((len(self.paths), len(self.period) + 1), dtype=np.int64)
+        self.cash_out = np.zeros((len(self.paths), len(self.period) + 1), dtype=np.int64)
+
     def make_period(self, period):
         begin, end = format_month(period[0]), format_month(period[1])
         cur_time = begin
@@ -126,100 +178,124 @@ class ExpandTreeGenerator:
                 yy, mm = yy + 1, 1
             cur_time = format_month(f'{yy}-{mm}')
 
+    # 전위 순회 순서로 브랜치 번호, 부모 번호, 깊이 배열 생성
     def dfs_make_list(self):
-        queue = deque([self.root])
+        queue = deque([(self.root, -1, 0)])
         while queue:
-            node = queue.pop()
-            self.account_book[node.path] = {t: [0, 0] for t in self.period}
+            node, parent, depth = queue.pop()
+            self.parents.append(parent)
+            self.depths.append(depth)
+            self.paths.append(node.path)
 
+            parent = len(self.paths) - 1
             for child_node in list(node.children.values())[::-1]:
-                queue.append(child_node)
-
-    def make_account_book(self, transactions):
-        for _date, _branch, _cashflow, _description in transactions:
-            _date = _date[:7:]
-
-            while len(self.root.path) <= len(_branch):
-                if _branch in self.account_book:
-                    if _cashflow > 0:
-                        self.account_book[_branch][_date][0] += _cashflow
-                    elif _cashflow < 0:
-                        self.account_book[_branch][_date][1] += _cashflow
-
-                # Parent Node
-                u = _branch.split('/')
-                _branch = '/'.join(u[:len(u) - 1:])
-
-        key_box = list(self.account_book.keys())
-        for _branch in key_box:
-            in_sum = sum([a[0] for a in self.account_book[_branch].values()])
-            out_sum = sum([a[1] for a in self.account_book[_branch].values()])
-            self.account_book[_branch]['Sum'] = [in_sum, out_sum]
+                queue.append((child_node, parent, depth + 1))
+
+        self.parents = np.array(self.parents, dtype=np.int64)
+        self.depths = np.array(self.depths, dtype=np.int64)
+
+    # 트리에 없는 브랜치는 가장 가까운 상위 브랜치로 귀속
+    def branch_index(self, path):
+        while path not in self.index and len(self.root.path) < len(path):
+            path = path.rsplit('/', 1)[0]
+        return self.index.get(path, -1)
+
+    # rows: make_expand_box 결과 (_BranchId, 월 번호, 수입, 지출), branch_ids: {path: _BranchId}
+    def make_account_book(self, rows, branch_ids):
+        rows = np.array(rows, dtype=np.int64).reshape(-1, 4)
+
+        # _BranchId -> 행렬의 브랜치 번호
+        lookup = np.full(max(list(branch_ids.values()) + [int(rows[:, 0].max(initial=0))]) + 1, -1, dtype=np.int64)
+        for path, _id in branch_ids.items():
+            lookup[_id] = self.branch_index(path)
+
+        begin_y, begin_m = map(int, self.period[0].split('-'))
+        leaf_ids = lookup[rows[:, 0]]
+        month_ids = rows[:, 1] - (begin_y * 12 + begin_m - 1)
+        _ins, _outs = rows[:, 2], rows[:, 3]
+        valid = (leaf_ids >= 0) & (month_ids >= 0) & (month_ids < len(self.period))
+
+        # 리프 합계
+        np.add.at(self.cash_in, (leaf_ids[valid], month_ids[valid]), _ins[valid])
+        np.add.at(self.cash_out, (leaf_ids[valid], month_ids[valid]), _outs[valid])
+
+        # 깊은 레벨부터 부모 배열을 따라 상위 브랜치로 누적
+        for depth in range(int(self.depths.max()), 0, -1):
+            nodes = np.flatnonzero(self.depths == depth)
+            np.add.at(self.cash_in, self.parents[nodes], self.cash_in[nodes])
+            np.add.at(self.cash_out, self.parents[nodes], self.cash_out[nodes])
+
+        self.cash_in[:, -1] = self.cash_in[:, :-1].sum(axis=1)
+        self.cash_out[:, -1] = self.cash_out[:, :-1].sum(axis=1)
         self.period.append('Sum')
 
-    def make_excel(self, file_path_in, file_path_out):
+    # In / Out / Net 시트를 하나의 write-only 워크북으로 출력
+    def make_excel(self, file_path):
         try:
-            data_in = {branch: [self.account_book[branch][date][0] for date in self.period] for branch in self.account_book}
-            data_out = {branch: [self.account_book[branch][date][1] for date in self.period] for branch in self.account_book}
-
-            df_in = pd.DataFrame(data_in, index=self.period).transpose()
-            df_out = pd.DataFrame(data_out, index=self.period).transpose()
+            wb = Workbook(write_only=True)
+            styles = ExpandStyles(wb)
+            sheets = [('In', self.cash_in), ('Out', self.cash_out), ('Net', self.cash_in + self.cash_out)]
+            with timer('excel.rows'):
+                for sheet_name, book in sheets:
+                    self.write_sheet(wb.create_sheet(sheet_name), book, styles)
+            with timer('excel.save'):
+                wb.save(file_path)
 
-            self._save_to_excel(df_in, file_path_in, "In")
-            self._save_to_excel(df_out, file_path_out, "Out")
+            # Success Message
+            print(f"Excel file successfully saved as {file_path}")
+            print('...')
+            return True
         except Exception as e:
             print('Error:', e)
-
-    def _save_to_excel(self, df: pd.DataFrame, file_path, sheet_name):
-        wb = Workbook()
-        ws = wb.active
-        ws.title = sheet_name
-
-        # Adding DataFrame to worksheet
-        header_fill = PatternFill(start_color='012345', end_color="012345", fill_type="solid")
-        for r_idx, row in enumerate(dataframe_to_rows(df, index=True, header=True)):
-            if r_idx == 1:
-                continue
-            r_idx = r_idx - 1 if r_idx > 1 else 0
-
-            box_fill = PatternFill(start_color="FFFFFF", end_color="FFFFFF", fill_type="solid")
-            if row[0]:
-                depth = len(row[0].split('/'))
-                color = adjust_color(depth)
-                hex_color = '{:02X}{:02X}{:02X}'.format(*color)
-                box_fill = PatternFill(start_color=hex_color, end_color="ABCDEF", fill_type="solid")
-
-            for c_idx, value in enumerate(row):
-                if type(value) == int:
-                    value = format_cost(value)
-
-                cell = ws.cell(row=r_idx + 1, column=c_idx + 1, value=value)
-                if c_idx == 0:
-                    cell.alignment = Alignment(horizontal="left", vertical="center")
-                else:
-                    cell.alignment = Alignment(horizontal="center", vertical="center")
-
-                # Styling headers
-                cell.fill = box_fill
-                if r_idx == 0:
-                    cell.fill = header_fill
-                    cell.font = Font(bold=True, color='FEFEFE')
-                elif c_idx == 0:
-                    cell.font = Font(bold=True, size=7.5)
-                else:
-                    cell.font = Font(size=8)
-
-        # Set column widths
-        for col in ws.columns:
-            max_length = 0
-            column = col[0].column_letter
-            for cell in col:
-                try:
-                    if len(str(cell.value)) > max_length:
-                        max_length = len(cell.value)
-                except:
-                    pass
-            adjusted_width = (max_length + 2)
-            ws.column_dimensions[column].width = adjusted_width
-
-        wb.save(file_path)
+            return False
+
+    def write_sheet(self, ws, book, styles):
+        # 열 너비: 값의 최대 길이 + 2, 금액 열은 최대/최소값의 표기 길이로 결정
+        widths = [max(len(path) for path in self.paths) + 2]
+        for c_idx, period in enumerate(self.period):
+            column = book[:, c_idx]
+            max_length = max(len(period), len(format_cost(int(column.max()))), len(format_cost(int(column.min()))))
+            widths.append(max_length + 2)
+        for c_idx, width in enumerate(widths):
+            ws.column_dimensions[get_column_letter(c_idx + 1)].width = width
+
+        # Styling headers
+        ws.append([styles.cell(ws, value, 'expand_header') for value in [None] + self.period])
+
+        for b_idx, path in enumerate(self.paths):
+            depth = len(path.split('/'))
+            row = [styles.cell(ws, path, styles.branch(depth))]
+            value_style = styles.value(depth)
+            row.extend(styles.cell(ws, format_cost(value), value_style) for value in book[b_idx].tolist())
+            ws.append(row)
+
+
+# expand 워크북 스타일 (깊이별 배경색), 워크북 당 한 번 등록 후 이름으로 공유
+class ExpandStyles:
+    def __init__(self, wb):
+        self.wb = wb
+        self.names = set()
+        self.add('expand_header', font=Font(bold=True, color='FEFEFE'), alignment=Alignment(horizontal="center", vertical="center"),
+                 fill=PatternFill(start_color='012345', end_color="012345", fill_type="solid"))
+
+    def add(self, name, **kwargs):
+        if name not in self.names:
+            self.wb.add_named_style(NamedStyle(name=name, **kwargs))
+            self.names.add(name)
+        return name
+
+    def fill(self, depth):
+        hex_color = '{:02X}{:02X}{:02X}'.format(*adjust_color(depth))
+        return PatternFill(start_color=hex_color, end_color="ABCDEF", fill_type="solid")
+
+    def branch(self, depth):
+        return self.add(f'expand_branch_{depth}', font=Font(bold=True, size=7.5), fill=self.fill(depth),
+                        alignment=Alignment(horizontal="left", vertical="center"))
+
+    def value(self, depth):
+        return self.add(f'expand_value_{depth}', font=Font(size=8), fill=self.fill(depth),
+                        alignment=Alignment(horizontal="center", vertical="center"))
+
+    @staticmethod
+    def cell(ws, value, style_name):
+        return styled_cell(ws, value, style_name)
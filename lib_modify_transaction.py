@@ -14,9 +14,9 @@ valid_date_formats = [
 
 
 class ImageBrowser(tk.Tk):
-    def __init__(self, branch_path, sync_function):
+    def __init__(self, branch_path, db):
         super().__init__()
-        self.sync = sync_function
+        self.db = db
         self.title("Image Browser")
         self.geometry("800x600")
 
@@ -141,15 +141,11 @@ class ImageBrowser(tk.Tk):
         old_filename = self.image_files[self.current_index]
         new_filename = f"{date}_{branch}_{transaction}_{description}.jpg"
 
-        old_path = os.path.join(self.folder_path, old_filename)
-        new_path = os.path.join(self.folder_path, new_filename)
-
         try:
-            os.rename(old_path, new_path)
+            self.db.rename_one(old_filename, new_filename)
             self.image_files[self.current_index] = new_filename
             self.show_image()
             self.destroy()
-            self.sync()
         except Exception as e:
             messagebox.showinfo("Fail", str(e))
 
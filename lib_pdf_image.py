@@ -3,56 +3,116 @@ from reportlab.lib.pagesizes import A4
 from reportlab.pdfgen import canvas
 from reportlab.pdfbase.ttfonts import TTFont
 from reportlab.pdfbase import pdfmetrics
+from lib_thumbnail import ThumbnailCache
+from lib_profiler import timer
+import struct
 import os
 
+font_name = 'KoreanFont'
+font_path = "NanumGothic.ttf"  # 프로젝트 디렉토리에 저장된 한글 폰트 파일의 경로
+pdf_builder = None  # 프로세스 당 하나, 첫 사용 시 생성
 
-def generate_image_pdf(image_paths, file_path):
-    # A4 size
-    w, h = A4
-    c = canvas.Canvas(file_path, pagesize=A4)
 
-    # 한글 전용 폰트 설정
-    font_path = "NanumGothic.ttf"  # 프로젝트 디렉토리에 저장된 한글 폰트 파일의 경로
-    pdfmetrics.registerFont(TTFont('KoreanFont', font_path))
+# 한글 전용 폰트 등록 (프로세스 당 한 번)
+def register_fonts():
+    if font_name not in pdfmetrics.getRegisteredFontNames():
+        pdfmetrics.registerFont(TTFont(font_name, font_path))
 
-    # 4개씩 묶기 -> 페이지 분할
-    positions = [(0, h / 2), (w / 2, h / 2), (0, 0), (w / 2, 0)]
-    sizes = [(w / 2, h / 2), (w / 2, h / 2), (w / 2, h / 2), (w / 2, h / 2)]
 
-    # 페이지 구성 (4개씩)
-    for page_num in range(0, len(image_paths), 4):
+# 이미지 크기 (width, height) 를 디코딩 없이 파일 헤더에서 읽음, 알 수 없는 형식은 PIL 로 대체
+def image_size(image_path):
+    with open(image_path, 'rb') as f:
+        head = f.read(26)
+        if head[:8] == b'\x89PNG\r\n\x1a\n' and head[12:16] == b'IHDR':
+            return struct.unpack('>II', head[16:24])
+        if head[:6] in (b'GIF87a', b'GIF89a'):
+            return struct.unpack('<HH', head[6:10])
+        if head[:2] == b'\xff\xd8':
+            f.seek(2)
+            while True:
+                marker = f.read(2)
+                if len(marker) < 2 or marker[0] != 0xFF:
+                    break
+                if marker[1] in (0xD8, 0x01) or 0xD0 <= marker[1] <= 0xD7:  # 길이 없는 마커
+                    continue
+                length = struct.unpack('>H', f.read(2))[0]
+                # SOF0~SOF15 (DHT, JPG, DAC 제외)
+                if 0xC0 <= marker[1] <= 0xCF and marker[1] not in (0xC4, 0xC8, 0xCC):
+                    height, width = struct.unpack('>xHH', f.read(5))
+                    return width, height
+                f.seek(length - 2, os.SEEK_CUR)
+
+    with Image.open(image_path) as img:
+        return img.size
+
+
+# 영수증 이미지를 A4 한 페이지에 4장씩 배치하는 PDF 생성기 (여러 보고서에 재사용)
+class ImagePdfBuilder:
+    def __init__(self, cache=None):
+        register_fonts()
+        self.cache = cache if cache is not None else ThumbnailCache()
+
+        # 4개씩 묶기 -> 페이지 분할
+        w, h = A4
+        self.positions = [(0, h / 2), (w / 2, h / 2), (0, 0), (w / 2, 0)]
+        self.sizes = [(w / 2, h / 2), (w / 2, h / 2), (w / 2, h / 2), (w / 2, h / 2)]
+
+    def build(self, image_paths, file_path):
+        c = canvas.Canvas(file_path, pagesize=A4, invariant=1)  # 생성 시각/ID 고정 -> 동일 입력, 동일 출력
+
+        # 페이지 구성 (4개씩)
+        for page_num in range(0, len(image_paths), 4):
+            self.draw_page(c, image_paths[page_num:page_num + 4])
+
+            # 페이지 기록, 이 페이지의 이미지 참조는 draw_page 종료와 함께 해제
+            with timer('pdf.page'):
+                c.showPage()
+
+        with timer('pdf.save'):
+            c.save()
+        with timer('pdf.evict'):
+            self.cache.evict()
+        print(f"PDF file successfully saved as {file_path}")
+        print('...')
+
+    # 1<=n<=4 개의 이미지들을 페이지에 배치
+    def draw_page(self, c, page_images):
         # 페이지 한글 폰트 설정
-        c.setFont('KoreanFont', 6)
+        c.setFont(font_name, 6)
 
-        # 1<=n<=4 개의 이미지들을 페이지에 배치
-        page_images = image_paths[page_num:page_num + 4]
         for i, img_path in enumerate(page_images):
-            # 이미지 사이즈 및 비율
-            img = Image.open(img_path)
-            img_width, img_height = img.size
-            scale_factor = min(sizes[i][0] / img_width, (sizes[i][1] - 20) / img_height)
+            # 이미지 사이즈 및 비율 (4분할 칸 크기로 축소된 썸네일 사용)
+            with timer('pdf.thumbnail'):
+                thumb_path = self.cache.get(img_path)
+                img_width, img_height = image_size(thumb_path)
+            scale_factor = min(self.sizes[i][0] / img_width, (self.sizes[i][1] - 20) / img_height)
 
             new_width = img_width * scale_factor
             new_height = img_height * scale_factor
 
             # 페이지 내 이미지 좌표 설정
-            x_offset = (sizes[i][0] - new_width) / 2
-            y_offset = (sizes[i][1] - new_height) / 2 + 10
+            x_offset = (self.sizes[i][0] - new_width) / 2
+            y_offset = (self.sizes[i][1] - new_height) / 2 + 10
 
-            x = positions[i][0] + x_offset
-            y = positions[i][1] + y_offset
+            x = self.positions[i][0] + x_offset
+            y = self.positions[i][1] + y_offset
 
             # 이미지 배치
-            c.drawImage(img_path, x, y, width=new_width, height=new_height)
+            with timer('pdf.draw'):
+                c.drawImage(thumb_path, x, y, width=new_width, height=new_height)
 
             # 파일명 텍스트 배치
             filename = os.path.basename(img_path)
-            text_x = positions[i][0] + (sizes[i][0] - c.stringWidth(filename, 'KoreanFont', 6)) / 2
-            c.drawString(text_x, positions[i][1] + y_offset - 15, filename)
-
-        # 페이지 업데이트
-        c.showPage()
-        
-    c.save()
-    print(f"Excel file successfully saved as {file_path}")
-    print('...')
+            text_x = self.positions[i][0] + (self.sizes[i][0] - c.stringWidth(filename, font_name, 6)) / 2
+            c.drawString(text_x, self.positions[i][1] + y_offset - 15, filename)
+
+
+def generate_image_pdf(image_paths, file_path, cache=None):
+    global pdf_builder
+    if cache is not None:
+        ImagePdfBuilder(cache).build(image_paths, file_path)
+        return
+
+    if pdf_builder is None:
+        pdf_builder = ImagePdfBuilder()
+    pdf_builder.build(image_paths, file_path)
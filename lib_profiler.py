@@ -0,0 +1,102 @@
+from contextlib import contextmanager, nullcontext
+import json
+import math
+import re
+import sqlite3
+import time
+
+enabled = False  # profile on / --profile
+samples = {}  # {이름: [(기록 시각, 소요 시간(s)), ...]}
+
+
+def enable():
+    global enabled
+    enabled = True
+
+
+def disable():
+    global enabled
+    enabled = False
+
+
+def reset():
+    samples.clear()
+
+
+def record(name, seconds):
+    samples.setdefault(name, []).append((time.time(), seconds))
+
+
+# with timer('excel.save'): ... -> 비활성 상태에서는 시간 측정 없이 통과
+@contextmanager
+def timer(name):
+    if not enabled:
+        yield
+        return
+
+    begin = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - begin)
+
+
+# 다른 프로세스 (보고서 렌더링 풀) 에서 수집한 샘플 병합
+def merge(other_samples):
+    for name, values in other_samples.items():
+        samples.setdefault(name, []).extend(values)
+
+
+def percentile(values, p):
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, math.ceil(p / 100 * len(values)) - 1))  # nearest-rank
+    return values[index]
+
+
+# [(이름, 횟수, 합계, p50, p95, 최대), ...] (합계 내림차순)
+def summary():
+    rows = []
+    for name, values in samples.items():
+        seconds = [value for _, value in values]
+        rows.append((name, len(seconds), sum(seconds), percentile(seconds, 50), percentile(seconds, 95), max(seconds)))
+    return sorted(rows, key=lambda row: -row[2])
+
+
+# 샘플 한 건당 한 줄 (JSON lines), 반환: 기록한 줄 수
+def dump(file_path):
+    count = 0
+    with open(file_path, 'a', encoding='utf-8') as f:
+        for name, values in samples.items():
+            for timestamp, seconds in values:
+                f.write(json.dumps({'name': name, 'time': timestamp, 'seconds': seconds}, ensure_ascii=False) + '\n')
+                count += 1
+    return count
+
+
+# SQL 문 -> 샘플 이름 (공백 정리, 앞부분만)
+def sql_name(sql):
+    return 'sql ' + re.sub(r'\s+', ' ', sql).strip()[:80]
+
+
+# 실행 시간을 기록하는 sqlite3 연결/커서 (sqlite3.connect(..., factory=ProfiledConnection))
+# 스트리밍 커서는 첫 행까지의 시간만 측정됨
+class ProfiledCursor(sqlite3.Cursor):
+    def execute(self, sql, parameters=()):
+        with timer(sql_name(sql)) if enabled else nullcontext():
+            return super().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        with timer(sql_name(sql)) if enabled else nullcontext():
+            return super().executemany(sql, seq_of_parameters)
+
+
+class ProfiledConnection(sqlite3.Connection):
+    def cursor(self, factory=ProfiledCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
@@ -0,0 +1,185 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from lib_make_excel import AccountBookGenerator
+from lib_pdf_image import generate_image_pdf
+from lib_profiler import timer
+import lib_profiler as profiler
+from datetime import date, timedelta
+from itertools import groupby
+
+import hashlib
+import json
+import os
+
+report_workers = os.cpu_count() or 1  # 기간 그룹 렌더링 프로세스 수 (report -j N)
+headers = ['DATE', 'BRANCH', 'IN', 'OUT', 'BALANCE', 'DESCRIPTION']
+manifest_name = 'manifest.json'
+report_version = 1  # 출력 형식이 바뀌면 올려서 기존 산출물 전체 재생성
+interval_units = {'d': ('day', 1), 'w': ('day', 7), 'm': ('month', 1), 'q': ('month', 3), 'y': ('month', 12)}
+
+
+# 그룹 단위 입력 -> ('day' | 'month', n), 숫자만 입력 시 개월 수, 잘못된 입력은 None
+def parse_interval(text):
+    text = text.strip().lower()
+    unit = 'm'
+    if text[-1:] in interval_units:
+        text, unit = text[:-1], text[-1]
+    if not text.isdigit() or int(text) <= 0:
+        return None
+
+    unit, size = interval_units[unit]
+    return unit, int(text) * size
+
+
+# 그룹 번호 -> (시작일, 다음 그룹 시작일), 첫 그룹은 begin_date 부터, 월 단위 그룹은 이후 매월 1일부터 시작
+def bucket_bounds(begin_date, end_date, interval, index):
+    unit, n = interval
+    if unit == 'month':
+        begin_y, begin_m = map(int, begin_date.split('-')[:2])
+
+        def month_start(k):
+            yy, mm = divmod(begin_y * 12 + begin_m - 1 + k, 12)
+            return f'{yy:04d}-{mm + 1:02d}-01'
+
+        start = begin_date if index == 0 else month_start(index * n)
+        nxt = month_start((index + 1) * n)
+    else:
+        begin = date.fromisoformat(begin_date)
+        start = (begin + timedelta(days=index * n)).isoformat()
+        nxt = (begin + timedelta(days=(index + 1) * n)).isoformat()
+    return start, min(nxt, end_date)
+
+
+# make_report_box 결과 (정렬된 그룹 번호) 를 한 번 순회하며 그룹별로 묶음 -> {'시작일~다음 시작일': 거래 목록}
+def group_rows(rows, begin_date, end_date, interval):
+    page_box = {}
+    for index, group in groupby(rows, key=lambda row: row[0]):
+        start, nxt = bucket_bounds(begin_date, end_date, interval, index)
+        page_box[f'{start}~{nxt}'] = [row[1:] for row in group]
+    return page_box
+
+
+# 보고서 디렉토리 이름용 그룹 단위 (예: 3m, 14d)
+def interval_label(interval):
+    unit, n = interval
+    return f"{n}{'m' if unit == 'month' else 'd'}"
+
+
+# 기간 그룹 입력 해시: 거래 행 + 영수증 파일 (이름, 크기, 수정 시각)
+def group_digest(transactions, image_paths):
+    digest = hashlib.sha256(f'v{report_version}'.encode())
+    for row in transactions:
+        digest.update(repr(tuple(row)).encode())
+    for image_path in image_paths:
+        try:
+            file_stat = os.stat(image_path)
+            digest.update(f'{image_path}|{file_stat.st_size}|{file_stat.st_mtime_ns}'.encode())
+        except OSError:
+            digest.update(f'{image_path}|missing'.encode())
+    return digest.hexdigest()
+
+
+def load_manifest(dir_path):
+    try:
+        with open(os.path.join(dir_path, manifest_name), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_manifest(dir_path, manifest):
+    tmp_path = os.path.join(dir_path, manifest_name + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=4, sort_keys=True)
+    os.replace(tmp_path, os.path.join(dir_path, manifest_name))
+
+
+# jobs 중 입력이 바뀌었거나 산출물이 없는 그룹만 다시 출력, 기간 내 사라진 그룹은 삭제
+# 반환: (다시 출력한 그룹 수, 재사용한 그룹 수, 삭제한 그룹 수, 출력에 실패한 그룹 수)
+def update_report(dir_path, jobs, period, workers=None):
+    begin_date, end_date = period
+    manifest = load_manifest(dir_path)
+
+    stale_jobs, digests = [], {}
+    for file_path, transactions, image_paths in jobs:
+        key = os.path.basename(file_path)
+        digests[key] = group_digest(transactions, image_paths)
+        outputs_exist = os.path.exists(file_path + '.xlsx') and os.path.exists(file_path + '.pdf')
+        if manifest.get(key) != digests[key] or not outputs_exist:
+            stale_jobs.append((file_path, transactions, image_paths))
+
+    # 이번 기간에 포함되지만 더 이상 거래가 없는 그룹
+    removed = [key for key in manifest if key not in digests and begin_date <= key.split('~')[0] and key.split('~')[1] <= end_date]
+    for key in removed:
+        for extension in ('.xlsx', '.pdf'):
+            try:
+                os.remove(os.path.join(dir_path, key + extension))
+            except OSError:
+                pass
+        del manifest[key]
+
+    # 출력 전 해당 그룹을 manifest 에서 제외 -> 중단되어도 다음 실행 때 다시 출력
+    for file_path, _, _ in stale_jobs:
+        manifest.pop(os.path.basename(file_path), None)
+    save_manifest(dir_path, manifest)
+
+    # 엑셀/PDF 모두 기록된 그룹만 manifest 에 기록 -> 실패한 그룹은 다음 실행 때 다시 출력
+    done = render_groups(stale_jobs, workers) if stale_jobs else []
+    if done:
+        for file_path in done:
+            manifest[os.path.basename(file_path)] = digests[os.path.basename(file_path)]
+        save_manifest(dir_path, manifest)
+
+    return len(done), len(jobs) - len(stale_jobs), len(removed), len(stale_jobs) - len(done)
+
+
+# 기간 그룹 하나 출력 (엑셀 장부 + 영수증 PDF), 프로세스 풀에서 실행되므로 모듈 함수로 유지
+# 반환: 두 파일 모두 기록되었는지 여부 (엑셀 파일이 열려 있는 경우 등)
+def render_group(file_path, transactions, image_paths):
+    with timer('report.group'):
+        xl_generator = AccountBookGenerator(transactions, headers)
+        if not xl_generator.make_excel(file_path + '.xlsx'):
+            return False
+        try:
+            generate_image_pdf(image_paths, file_path + '.pdf')
+        except Exception as e:
+            print('!Error:', e)
+            return False
+    return True
+
+
+# profile on 상태의 풀 작업: 작업 프로세스에서 측정한 샘플을 함께 반환
+def render_group_profiled(file_path, transactions, image_paths):
+    profiler.enable()
+    profiler.reset()
+    ok = render_group(file_path, transactions, image_paths)
+    return ok, dict(profiler.samples)
+
+
+# jobs: [(file_path, transactions, image_paths)], 그룹 간 의존성이 없으므로 병렬 처리
+# 반환: 출력에 성공한 그룹의 file_path 목록
+def render_groups(jobs, workers=None):
+    workers = min(workers or report_workers, len(jobs))
+    done = []
+    if workers <= 1:
+        for i, job in enumerate(jobs):
+            if render_group(*job):
+                done.append(job[0])
+            print_progress(i + 1, len(jobs), job[0])
+        return done
+
+    task = render_group_profiled if profiler.enabled else render_group
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(task, *job): job[0] for job in jobs}
+        for i, future in enumerate(as_completed(futures)):
+            ok = future.result()
+            if profiler.enabled:
+                ok, samples = ok
+                profiler.merge(samples)
+            if ok:
+                done.append(futures[future])
+            print_progress(i + 1, len(jobs), futures[future])
+    return done
+
+
+def print_progress(done, total, file_path):
+    print(f"[{done}/{total}] {os.path.basename(file_path)}")
@@ -1,25 +1,57 @@
 import lib_sanitizer as st
-from lib_make_excel import AccountBookGenerator, ExpandTreeGenerator
 import calendar
 import lib_branch as br
 import lib_database as dbl
-from lib_tree_editor import TreeEditor
-from lib_insert_transaction import ImageSaver
-from lib_delete_transaction import delete_transaction
-from lib_modify_transaction import ImageBrowser
-from lib_pdf_image import generate_image_pdf
-
-import matplotlib.pyplot as plt
-from matplotlib.ticker import FuncFormatter
+from lib_watcher import ReceiptWatcher
+from lib_export import export_rows, export_formats
+import lib_profiler as profiler
+
 from prettytable import PrettyTable
+from collections import OrderedDict
+import unicodedata
 from datetime import datetime, timedelta
 import os
 
 DATABASE_NAME = "accountBook.db"
 quit_commands = {'q!', 'Q!', 'quit', 'QUIT'}
+image_extensions = {'.png', '.jpg', '.jpeg'}  # 보고서 PDF 에 포함할 영수증 형식
+query_cache_size = 64  # 조회 결과 캐시 항목 수 (LRU)
+refer_page_size = 50  # refer -d 페이지 당 행 수
+refer_max_width = 40  # refer -d 브랜치/내역 열 최대 폭 (초과 시 생략)
+
+
+# 터미널 표시 폭 (한글 등 전각 문자는 2칸)
+def display_width(text):
+    return sum(2 if unicodedata.east_asian_width(ch) in 'WF' else 1 for ch in text)
+
+
+# 표시 폭 기준으로 자르고 정렬 ('<', '>', '^')
+def fit(text, width, align):
+    text = str(text)
+    if display_width(text) > width:
+        while display_width(text) > width - 1:
+            text = text[:-1]
+        text += '…'
+    padding = width - display_width(text)
+    if align == '>':
+        return ' ' * padding + text
+    if align == '^':
+        return ' ' * (padding // 2) + text + ' ' * (padding - padding // 2)
+    return text + ' ' * padding
+
+
+def table_border(widths):
+    return '+' + '+'.join('-' * (width + 2) for width in widths) + '+'
+
+
+def table_row(values, widths, aligns):
+    return '|' + '|'.join(f' {fit(value, width, align)} ' for value, width, align in zip(values, widths, aligns)) + '|'
 
 
 def create_graph(results, data_type):
+    import matplotlib.pyplot as plt
+    from matplotlib.ticker import FuncFormatter
+
     plt.style.use('dark_background')
 
     months = [result[0] for result in results]
@@ -52,16 +84,35 @@ def display_help():
 
 
 class Shell:
-    def __init__(self):
+    def __init__(self, watch=False):
         self.prompt = "$[~Home/]>> "  # 프롬프트 메시지 (현 브랜치 기반)
         self.db = None
         self.root = None
         self.branch = None
+        self.watcher = None  # 영수증 폴더 감시 (opt-in)
+        self.query_cache = OrderedDict()  # {(브랜치 경로, 기간, 조회 종류, data_type): 결과}
+        self.cache_stamp = None  # 캐시를 채울 때의 (DB 연결, 데이터 버전)
+        self.cache_hits, self.cache_misses = 0, 0
         self.synchronization_tree()
         self.synchronization_db()
+        if watch:
+            self.watch(['watch', 'on'])
 
-    # 유저 커맨드 실행
+    # 에러 메시지 출력 및 실패 기록 (배치 모드 종료 코드)
+    def error(self, *message):
+        self.failed = True
+        print(*message)
+
+    # 유저 커맨드 실행, 반환: 성공 여부 (profile on: 명령별 소요 시간 기록)
     def fetch(self, command):
+        if not profiler.enabled:
+            return self.run_command(command)
+
+        with profiler.timer('cmd ' + (command.split() or [''])[0]):
+            return self.run_command(command)
+
+    def run_command(self, command):
+        self.failed = False
         try:
             list_cmd = command.split()
             if list_cmd[0] in {'chdir', 'cd'} and len(list_cmd) == 2:
@@ -80,39 +131,170 @@ class Shell:
                 self.graph(list_cmd)
             elif list_cmd[0] in {'excel', 'xl'} and len(list_cmd) == 2:
                 self.display_excel(list_cmd)
+            elif list_cmd[0] in {'export', 'exp'} and 2 <= len(list_cmd) <= 4:
+                self.export(list_cmd)
             elif list_cmd[0] == 'help' and len(list_cmd) == 1:
                 display_help()
-            elif list_cmd[0] in {'report', 'rp'} and len(list_cmd) == 1:
-                self.report_generator()
+            elif list_cmd[0] in {'report', 'rp'} and len(list_cmd) <= 5:
+                self.report_generator(list_cmd)
             elif list_cmd[0] in {'sync', 'synchronization'} and len(list_cmd) == 1:
-                self.synchronization_db()
+                self.sync()
+            elif list_cmd[0] in {'sync', 'synchronization'} and list_cmd[1:] == ['--full']:
+                self.sync(full=True)
+            elif list_cmd[0] == 'stats' and (len(list_cmd) == 1 or (len(list_cmd) == 3 and list_cmd[1] == '--dump')):
+                self.stats(list_cmd)
+            elif list_cmd[0] == 'profile' and len(list_cmd) <= 2:
+                self.profile(list_cmd)
+            elif list_cmd[0] in {'dupes', 'dup'} and len(list_cmd) == 1:
+                self.dupes()
+            elif list_cmd[0] == 'watch' and len(list_cmd) <= 2:
+                self.watch(list_cmd)
             elif list_cmd[0] in {'tree', 'tr'} and len(list_cmd) == 1:
                 self.tree()
-            elif list_cmd[0] in {'expand', 'ex', 'ep'} and len(list_cmd) == 1:
-                self.expand_tree()
-
+            elif list_cmd[0] in {'expand', 'ex', 'ep'} and len(list_cmd) <= 3:
+                self.expand_tree(list_cmd)
+            else:
+                self.error('!Error: Unknown command or wrong parameters:', command)
 
         except Exception as e:
-            print('!Error:', e)
-            pass
+            self.error('!Error:', e)
+        return not self.failed
+
+    # 조회 결과 캐시 (LRU), DB 데이터 버전이 바뀌면 전체 무효화
+    # 반환값은 여러 명령이 공유하므로 호출자가 수정하지 않아야 함
+    def cached_query(self, kind, period, query, data_type=None):
+        stamp = (self.db, self.db.data_stamp())
+        if stamp != self.cache_stamp:
+            self.query_cache.clear()
+            self.cache_stamp = stamp
+
+        key = (self.branch.path, tuple(period), kind, data_type)
+        if key in self.query_cache:
+            self.cache_hits += 1
+            self.query_cache.move_to_end(key)
+            return self.query_cache[key]
+
+        self.cache_misses += 1
+        result = query()
+        self.query_cache[key] = result
+        if len(self.query_cache) > query_cache_size:
+            self.query_cache.popitem(last=False)
+        return result
+
+    # 조회 캐시 통계 + (profile on) 명령/SQL/단계별 지연 시간, stats --dump FILE: 샘플을 JSON lines 로 저장
+    def stats(self, list_cmd: list):
+        if profiler.samples:
+            table = PrettyTable()
+            table.field_names = ['NAME', 'COUNT', 'TOTAL(ms)', 'P50(ms)', 'P95(ms)', 'MAX(ms)']
+            table.align['NAME'] = 'l'
+            for name, count, total, p50, p95, longest in profiler.summary():
+                table.add_row([name, count, f'{total * 1000:,.1f}', f'{p50 * 1000:,.2f}', f'{p95 * 1000:,.2f}', f'{longest * 1000:,.2f}'])
+            print(table)
+
+        total = self.cache_hits + self.cache_misses
+        print("- Profile: {}".format('on' if profiler.enabled else 'off'))
+        print("- Query Cache: {} / {} entries".format(len(self.query_cache), query_cache_size))
+        print("- Hits: {}, Misses: {}, Hit Rate: {:.1f}%".format(
+            self.cache_hits, self.cache_misses, self.cache_hits / total * 100 if total else 0))
+        print("- Generation: {}".format(self.db.generation))
+
+        if len(list_cmd) == 3:
+            count = profiler.dump(list_cmd[2])
+            print("- Dumped: {} samples to {}".format(count, list_cmd[2]))
+        print("...")
+
+    # 프로파일링 (profile on / profile off / profile reset / profile)
+    def profile(self, list_cmd: list):
+        if len(list_cmd) == 1:
+            print("- Profile: {}".format('on' if profiler.enabled else 'off'))
+            print("...")
+        elif list_cmd[1] == 'on':
+            profiler.enable()
+        elif list_cmd[1] == 'off':
+            profiler.disable()
+        elif list_cmd[1] == 'reset':
+            profiler.reset()
+        else:
+            self.error("!Error: profile on|off|reset")
 
     # 트랜젝션 컨트롤러
-    def synchronization_db(self):
-        self.db = dbl.DatabaseController()
+    def synchronization_db(self, full=False):
+        if self.db is None:  # 최초 실행
+            self.db = dbl.DatabaseController()
+        elif full:  # 전체 재구성: 브랜치 id 가 바뀌므로 감시 스레드의 연결도 새로 생성
+            running = self.watcher is not None and self.watcher.is_alive()
+            if running:
+                self.watcher.stop()
+            old_db, self.db = self.db, dbl.DatabaseController(full)
+            old_db.database.close()
+            if running:
+                self.watcher = ReceiptWatcher()
+                self.watcher.start()
+        else:  # 변경된 영수증만 반영
+            self.db.synchronize()
+
+    # 동기화 후 결과 및 처리량 출력
+    def sync(self, full=False):
+        self.synchronization_db(full)
+        stats = self.db.sync_stats
+        print("- Ingested: {}, Rejected: {}, Removed: {}".format(stats['ingested'], stats['rejected'], stats['removed']))
+        print("- Scanned: {} files in {:.2f}s ({:,.0f} files/s, {} worker(s))".format(
+            stats['files'], stats['seconds'], stats['files_per_sec'], stats['workers']))
+        print("...")
+
+    # 중복 의심 영수증 출력
+    def dupes(self):
+        duplicates = self.db.find_duplicates()
+
+        table = PrettyTable()
+        table.field_names = ['NO', 'HASH', 'FILES']
+        table.align['FILES'] = 'l'
+        for i, (kind, digest, file_names) in enumerate(duplicates):
+            table.add_row([i + 1, f'{kind}: {digest[:16]}', '\n'.join(file_names)])
+        print(table)
+
+        print("\n*** Summary ***")
+        print("- Groups: {}".format(len(duplicates)))
+        print("- Files: {}".format(sum(len(file_names) for _, _, file_names in duplicates)))
+        print()
+
+    # 영수증 폴더 감시 (watch on / watch off / watch)
+    def watch(self, list_cmd: list):
+        running = self.watcher is not None and self.watcher.is_alive()
+        if len(list_cmd) == 1:
+            print("- Watch: {}".format('on' if running else 'off'))
+            if self.watcher is not None:
+                print("- Applied: {}".format(self.watcher.applied))
+                if self.watcher.error is not None:
+                    print("- Last Error: {}".format(self.watcher.error))
+            print("...")
+        elif list_cmd[1] == 'on':
+            if not running:
+                self.watcher = ReceiptWatcher()
+                self.watcher.start()
+        elif list_cmd[1] == 'off':
+            if running:
+                self.watcher.stop()
+        else:
+            self.error("!Error: watch on|off")
 
     def synchronization_tree(self):
         json_tree = br.load_tree()
         root = br.build_tree_from_json(json_tree)
         self.root = root
         self.branch = self.root
+        if self.db is not None:  # 트리 변경 -> closure 테이블 갱신
+            self.db.sync_branches(json_tree)
 
     def insert_transaction(self):
         print('...Inserting Transaction')
-        ImageSaver(self.synchronization_db, self.branch.path.replace('-', '/'))
+        from lib_insert_transaction import ImageSaver
+        ImageSaver(self.db, self.branch.path.replace('-', '/'))
 
     def delete_transaction(self):
         print('...Deleting Transaction')
-        delete_transaction(self.synchronization_db, self.branch.path.replace('-', '/'))
+        from lib_delete_transaction import delete_transaction
+        delete_transaction(self.db, self.branch.path.replace('-', '/'))
         return
 
     # 브랜치 이동
@@ -126,7 +308,7 @@ class Shell:
             if target.isdigit():
                 index = int(target) - 1
                 if not (0 <= index < len(self.branch.children)):
-                    print("!Error: Not valid path")
+                    self.error("!Error: Not valid path")
                     print("...")
                     return
                 target = list(self.branch.children.keys())[index]
@@ -151,7 +333,7 @@ class Shell:
                 if navigating:
                     self.branch = navigating
                 else:
-                    print("!Error: Not valid path")
+                    self.error("!Error: Not valid path")
                     print("...")
             elif n > 0 and target == '':  # navigate to an address referenced from current Branch (depth > 1)
                 self.branch = navigating
@@ -160,7 +342,7 @@ class Shell:
                 if navigating:
                     self.branch = navigating
                 else:
-                    print("!Error: Not valid path")
+                    self.error("!Error: Not valid path")
                     print("...")
 
             # 3. 프롬프트 메시지 업데이트
@@ -182,56 +364,80 @@ class Shell:
             self.refer_monthly(list_cmd)
         elif list_cmd[1] == '-t':  # 브랜치 별
             self.refer_tree(list_cmd)
+        else:
+            self.error("!Error: refer -d|-m|-t")
 
-    # 일별 날짜 단위, 회계 장부 출력
+    # 일별 날짜 단위, 회계 장부 출력 (커서에서 페이지 단위로 스트리밍)
+    # ex) refer -d 2024-01-01~2024-12-31 --limit 100 --offset 200
     def refer_daily(self, list_cmd: list):
         # 날짜 변수
         begin_date, end_date = "0001-01-01", "9999-12-31"
-        if len(list_cmd) == 3:
-            begin, end = list_cmd[2].split('~')
-            if begin != '':
-                begin_date = st.format_date(begin)
-            if end != '':
-                end_date = st.format_date(end)
+        limit, offset = -1, 0
+        args = list_cmd[2:]
+        while args:
+            arg = args.pop(0)
+            if arg in {'--limit', '--offset'} and args:
+                value = int(args.pop(0))
+                if value < 0:
+                    self.error("!Error: --limit/--offset must be >= 0")
+                    print("...")
+                    return
+                limit, offset = (value, offset) if arg == '--limit' else (limit, value)
+            elif '~' in arg:
+                begin, end = arg.split('~')
+                if begin != '':
+                    begin_date = st.format_date(begin)
+                if end != '':
+                    end_date = st.format_date(end)
+            else:
+                begin_date = None
 
             # 잘못된 날짜 입력시, 에러메시지 반환
             if (begin_date is None) or (end_date is None):
-                print("!Error: NOT valid Date Input")
+                self.error("!Error: NOT valid Date Input")
                 print("...")
                 return
 
-        # Database 조회
-        daily_box = dbl.make_daily_box(self.branch, self.db, [begin_date, end_date])
+        # 요약은 집계 쿼리 한 번 (열 너비 계산에도 사용)
+        summary = self.cached_query('daily_summary', [begin_date, end_date],
+                                    lambda: dbl.make_daily_summary(self.branch, self.db, [begin_date, end_date]))
 
-        # 테이블 출력
-        table = PrettyTable()
-        table.field_names = ['DATE', 'BRANCH', 'IN', 'OUT', 'BALANCE', 'DESCRIPTION']
-        count, balance = 0, 0
-        total_in, total_out = 0, 0
-        for row in daily_box:
-            count += 1
-            r_date, r_branch, r_cashflow, r_desc = row
-            r_date = r_date.split()[0]
-
-            _in = st.format_cost(r_cashflow) if r_cashflow > 0 else '-'
-            _out = st.format_cost(-r_cashflow) if r_cashflow <= 0 else '-'
-
-            total_in += max(r_cashflow, 0)
-            total_out += -min(r_cashflow, 0)
-
-            balance = total_in - total_out
-            new_row = (r_date, r_branch, _in, _out, st.format_cost(balance), r_desc)
-            table.add_row(new_row)
-        print(table)
+        # 테이블 출력 (고정 폭 페이지)
+        headers = ['DATE', 'BRANCH', 'IN', 'OUT', 'BALANCE', 'DESCRIPTION']
+        cost_width = max(len(st.format_cost(-max(summary['IN'], summary['OUT']))), len('BALANCE'))
+        widths = [10, min(max(summary['BRANCH_BYTES'], len('BRANCH')), refer_max_width), cost_width, cost_width, cost_width,
+                  min(max(summary['DESCRIPTION_BYTES'], len('DESCRIPTION')), refer_max_width)]
+        aligns = ['<', '<', '>', '>', '>', '<']
+
+        balance = dbl.make_daily_balance(self.branch, self.db, [begin_date, end_date], offset)
+        daily_box = dbl.make_daily_box(self.branch, self.db, [begin_date, end_date], limit, offset)
+        count = 0
+        while True:
+            page = daily_box.fetchmany(refer_page_size)
+            if not page:
+                break
+
+            lines = [table_border(widths), table_row(headers, widths, ['^'] * len(widths)), table_border(widths)]
+            for r_date, r_branch, r_cashflow, r_desc in page:
+                count += 1
+                balance += r_cashflow
+                _in = st.format_cost(r_cashflow) if r_cashflow > 0 else '-'
+                _out = st.format_cost(-r_cashflow) if r_cashflow <= 0 else '-'
+                new_row = (r_date.split()[0], r_branch, _in, _out, st.format_cost(balance), r_desc)
+                lines.append(table_row(new_row, widths, aligns))
+            lines.append(table_border(widths))
+            print('\n'.join(lines), flush=True)
 
         # 요약
         print("\n*** Summary ***")
         print("- Branch: {}".format(self.branch.path))
         print("- Period: {} ~ {}".format(begin_date, end_date))
-        print("- Count: {}".format(count))
-        print("- Total In: {}".format(st.format_cost(total_in)))
-        print("- Total Out: {}".format(st.format_cost(total_out)))
-        print("- Balance: {}".format(st.format_cost(balance)))
+        print("- Count: {}".format(summary['COUNT']))
+        if count != summary['COUNT']:
+            print("- Shown: {} ~ {}".format(offset + 1, offset + count) if count else "- Shown: 0")
+        print("- Total In: {}".format(st.format_cost(summary['IN'])))
+        print("- Total Out: {}".format(st.format_cost(summary['OUT'])))
+        print("- Balance: {}".format(st.format_cost(summary['IN'] - summary['OUT'])))
         print()
 
     # 월별 날짜 단위, 회계 장부 출력
@@ -246,12 +452,13 @@ class Shell:
                 end_date = st.format_date(end)
             # 잘못된 날짜 입력시, 에러메시지 반환
             if (begin_date is None) or (end_date is None):
-                print("!Error: NOT valid Date Input")
+                self.error("!Error: NOT valid Date Input")
                 print("...")
                 return
 
         # 월별 리스트
-        monthly_box = dbl.make_monthly_box(self.branch, self.db, [begin_date, end_date])
+        monthly_box = self.cached_query('monthly', [begin_date, end_date],
+                                        lambda: dbl.make_monthly_box(self.branch, self.db, [begin_date, end_date]))
 
         # 테이블 출력
         table = PrettyTable()
@@ -282,10 +489,7 @@ class Shell:
 
     # 브랜치 단위, 트리 구조 출력
     def refer_tree(self, command: list):
-        # 1. 조상 노드 생성
-        cost_sums = {'Home': {'IN': 0, 'OUT': 0}}  # dictionary of each node's sum
-
-        # 2. 기간 설정
+        # 1. 기간 설정
         begin_date, end_date = '0000-01-01', '9999-12-31'
 
         if len(command) == 3:
@@ -295,54 +499,21 @@ class Shell:
             if end != '':
                 end_date = st.format_date(end)
             if (begin_date is None) or (end_date is None):
-                print("!Error: NOT valid Date Input")
+                self.error("!Error: NOT valid Date Input")
                 print("...")
                 return
         elif len(command) > 3:
-            print("!Error: Too many parameters")
+            self.error("!Error: Too many parameters")
             print("...")
             return
 
-        # 3. 빈 노드 채우기
-        # 3.1. 모든 트랜젝션 불러오기
-        sql_query = f"SELECT _Branch, _CashFlow FROM {self.db.table_name}"
-        sql_query += " WHERE _Branch LIKE '{}%'".format(self.branch.path)
-        sql_query += " AND '{}' <= _Date AND _Date <= '{}'".format(begin_date, end_date)
+        # 2. 브랜치 별 합계 (하위 브랜치 포함)
+        cost_sums = self.cached_query('tree', [begin_date, end_date],
+                                      lambda: dbl.make_tree_box(self.branch, self.db, [begin_date, end_date]))
 
-        self.db.cursor.execute(sql_query)
-        res = self.db.cursor.fetchall()
-
-        # 3.2. 기록
-        for node_path, cost in res:
-            cur_node = self.branch.path
-            if not cur_node in cost_sums:
-                cost_sums[cur_node] = {'IN': 0, 'OUT': 0}
-
-            children_path = node_path.split(self.branch.path)[1]
-            if cost > 0:
-                cost_sums[cur_node]['IN'] += cost
-            else:
-                cost_sums[cur_node]['OUT'] -= cost
-
-            for node in children_path.split('/'):
-                if node == '':
-                    continue
-                cur_node += '/{}'.format(node)
-                if not cur_node in cost_sums:
-                    cost_sums[cur_node] = {'IN': 0, 'OUT': 0}
-
-                if cost > 0:
-                    cost_sums[cur_node]['IN'] += cost
-                else:
-                    cost_sums[cur_node]['OUT'] -= cost
-
-        # 4. 재무 트리 출력
+        # 3. 재무 트리 출력
         def dfs_display(branch: br.Branch, depth: int):
-            if branch.path in cost_sums:
-                total_in = cost_sums[branch.path]['IN']
-                total_out = cost_sums[branch.path]['OUT']
-            else:
-                total_in, total_out = 0, 0
+            total_in, total_out = cost_sums[branch.path]
             branch_shape = '│    ' * depth + '└── '
             total_balance = st.format_cost(total_in - total_out)
             total_in = st.format_cost(total_in)
@@ -368,8 +539,10 @@ class Shell:
             elif list_cmd[1] == 'bal':
                 data_type = 'BALANCE'
             else:
+                self.error("!Error: graph in|out|bal")
                 return
         else:
+            self.error("!Error: graph in|out|bal")
             return
 
         begin_date, end_date = '0001-01-01', '9999-12-31'
@@ -378,11 +551,12 @@ class Shell:
             begin_date = st.format_date(begin) if begin else begin_date
             end_date = st.format_date(end) if end else end_date
             if (begin_date is None) or (end_date is None):
-                print("!Error: NOT valid Date Input")
+                self.error("!Error: NOT valid Date Input")
                 print("...")
                 return
 
-        graph_box = dbl.make_graph_box(self.branch, self.db, [begin_date, end_date], data_type)
+        graph_box = self.cached_query('graph', [begin_date, end_date],
+                                      lambda: dbl.make_graph_box(self.branch, self.db, [begin_date, end_date], data_type), data_type)
 
         # 그래프 생성
         create_graph(graph_box, data_type)
@@ -393,6 +567,8 @@ class Shell:
             self.excel_daily(list_cmd)
         elif list_cmd[1] == '-m':  # 월별 엑셀 데이터
             self.excel_monthly(list_cmd)
+        else:
+            self.error("!Error: excel -d|-m")
 
     # 일별 엑셀 데이터 출력
     def excel_daily(self, list_cmd: list):
@@ -407,22 +583,25 @@ class Shell:
 
             # 잘못된 날짜 입력시, 에러 메시지 반환
             if (begin_date is None) or (end_date is None):
-                print("!Error: NOT valid Date Input")
+                self.error("!Error: NOT valid Date Input")
                 print("...")
                 return
 
         # Database 조회
         daily_box = dbl.make_daily_box(self.branch, self.db, [begin_date, end_date])
+        summary = dbl.make_daily_summary(self.branch, self.db, [begin_date, end_date])
 
         # 엑셀 출력
         headers = ['DATE', 'BRANCH', 'IN', 'OUT', 'BALANCE', 'DESCRIPTION']
-        xl_generator = AccountBookGenerator(daily_box, headers)
+        from lib_make_excel import AccountBookGenerator
+        xl_generator = AccountBookGenerator(daily_box, headers, summary)
 
         os.makedirs('datas', exist_ok=True)
 
         time = str(datetime.now().timestamp()).replace('.', '_')
         file_path = f'datas/daily_{time}.xlsx'
-        xl_generator.make_excel(file_path)
+        if not xl_generator.make_excel(file_path):
+            self.failed = True
 
     # 월별 엑셀 데이터 출력
     def excel_monthly(self, list_cmd: list):
@@ -435,144 +614,190 @@ class Shell:
             if end != '':
                 end_date = st.format_date(end)
             if (begin_date is None) or (end_date is None):
-                print("!Error: NOT valid Date Input")
+                self.error("!Error: NOT valid Date Input")
                 print("...")
                 return
 
-        monthly_box = dbl.make_monthly_box(self.branch, self.db, [begin_date, end_date])
+        monthly_box = self.cached_query('monthly', [begin_date, end_date],
+                                        lambda: dbl.make_monthly_box(self.branch, self.db, [begin_date, end_date]))
         headers = ['MONTHLY', 'IN', 'OUT', 'BALANCE']
+        from lib_make_excel import AccountBookGenerator
         xl_generator = AccountBookGenerator(monthly_box, headers)
 
         os.makedirs('datas', exist_ok=True)
         time = str(datetime.now().timestamp()).replace('.', '_')
         file_path = f'datas/monthly_{time}.xlsx'
-        xl_generator.make_excel(file_path)
+        if not xl_generator.make_excel(file_path):
+            self.failed = True
+
+    # 일별(-d) / 월별(-m) 데이터를 CSV 또는 Parquet 으로 스트리밍 출력
+    # ex) export -d 2024-01-01~2024-12-31 parquet
+    def export(self, list_cmd: list):
+        if list_cmd[1] not in {'-d', '-m'}:
+            self.error("!Error: export -d|-m [begin~end] [csv|parquet]")
+            print("...")
+            return
+
+        file_format, begin_date, end_date = 'csv', '0001-01-01', '9999-12-31'
+        for arg in list_cmd[2:]:
+            if arg.lower() in export_formats:
+                file_format = arg.lower()
+            elif '~' in arg:
+                begin, end = arg.split('~')
+                if begin != '':
+                    begin_date = st.format_date(begin)
+                if end != '':
+                    end_date = st.format_date(end)
+            else:
+                begin_date = None
+
+            # 잘못된 입력시, 에러 메시지 반환
+            if (begin_date is None) or (end_date is None):
+                self.error("!Error: NOT valid Input")
+                print("...")
+                return
+
+        if list_cmd[1] == '-d':
+            rows = dbl.make_daily_box(self.branch, self.db, [begin_date, end_date])
+            headers, kind = ['DATE', 'BRANCH', 'CASHFLOW', 'DESCRIPTION'], 'daily'
+        else:
+            rows = [(monthly, _in, -_out) for monthly, _in, _out in dbl.make_monthly_box(self.branch, self.db, [begin_date, end_date])]
+            headers, kind = ['MONTHLY', 'IN', 'OUT'], 'monthly'
+
+        os.makedirs('datas', exist_ok=True)
+        time = str(datetime.now().timestamp()).replace('.', '_')
+        file_path = f'datas/{kind}_{time}.{file_format}'
+
+        start = datetime.now()
+        count = export_rows(rows, headers, file_path, file_format)
+        seconds = (datetime.now() - start).total_seconds()
+        print(f"{file_format.upper()} file successfully saved as {file_path}")
+        print("- Rows: {:,} in {:.2f}s".format(count, seconds))
+        print('...')
 
     def tree(self):
         if self.branch.path != self.root.path:
-            print('!Error:', "Home 디렉토리에서 실행해야 합니다")
+            self.error('!Error:', "Home 디렉토리에서 실행해야 합니다")
         else:
+            from lib_tree_editor import TreeEditor
             TreeEditor(self.synchronization_tree)
 
     def modify_transactions(self):
-        ImageBrowser(self.branch.path.replace('-', '/'), self.synchronization_db)
+        from lib_modify_transaction import ImageBrowser
+        ImageBrowser(self.branch.path.replace('-', '/'), self.db)
+
+    # rp [begin~end] [interval] [-j N], 기간/그룹 단위가 인자로 주어지면 입력 생략
+    def report_generator(self, list_cmd: list):
+        from lib_report import update_report, parse_interval, interval_label, group_rows
+
+        workers, period, interval_text = None, None, None
+        args = list_cmd[1:]
+        while args:
+            arg = args.pop(0)
+            if arg == '-j' and args:
+                workers = int(args.pop(0))
+            elif '~' in arg:
+                period = arg.split('~')
+            else:
+                interval_text = arg
 
-    def report_generator(self):
-        # Input Begin Date
-        begin_date = input('Input Begin Date (YYYY-MM-DD): ')
+        if period is None and interval_text is None:
+            begin_date = input('Input Begin Date (YYYY-MM-DD): ')
+            end_date = input('Input End Date (YYYY-MM-DD): ')
+            interval_text = input('Input the interval per grouping (N months, or Nd/Nw/Nm/Nq/Ny): ')
+        else:
+            begin_date, end_date = period or ['', '']
+            interval_text = interval_text or '1'
+
+        # Begin Date
         if begin_date == '':
             begin_date = '0000-01-01'
         else:
             begin_date = st.format_date(begin_date)
             if begin_date is None:
-                print('!Error:', 'Not valid date format..(begin input)')
+                self.error('!Error:', 'Not valid date format..(begin input)')
                 return
 
-        # Input End Date
-        end_date = input('Input End Date (YYYY-MM-DD): ')
+        # End Date
         if end_date == '':
             end_date = '9999-12-31'
         else:
             end_date = st.format_date(end_date)
             if end_date is None:
-                print('!Error:', 'Not valid date format..(end input)')
+                self.error('!Error:', 'Not valid date format..(end input)')
                 return
 
-        # Input Interval Month
-        try:
-            interval = int(input('Input the number of months per grouping: '))
-            if interval <= 0:
-                print('!Error:', 'you must input n > 0 in interval month..')
-                return
-        except Exception as e:
-            print('!Error:', e)
+        # Interval (N: 개월, Nd/Nw/Nm/Nq/Ny: 일/주/월/분기/년)
+        interval = parse_interval(interval_text)
+        if interval is None:
+            self.error('!Error:', 'you must input n > 0 in interval (e.g. 3, 10d, 2w, 1m, 1q, 1y)..')
             return
 
-        # SQL 쿼리 구성
-        sql_query = f"""
-            SELECT _Date, _Branch, _CashFlow, _Description 
-            FROM {self.db.table_name}
-            WHERE (_Date BETWEEN '{begin_date}' AND '{end_date}') AND _Branch LIKE '{self.branch.path}%'
-            ORDER BY _Date
-        """
-        self.db.cursor.execute(sql_query)
-        transactions = self.db.cursor.fetchall()
-
-        if not transactions:
+        # 기간 미입력 시 첫/마지막 거래일로 대체
+        first_date, last_date = dbl.make_date_bounds(self.branch, self.db, [begin_date, end_date])
+        if first_date is None:
             print("...No transactions found in the given date range.")
             return
+        begin_date = first_date if begin_date == '0000-01-01' else begin_date
+        end_date = last_date if end_date == '9999-12-31' else end_date
 
-        begin_y, begin_m, begin_d = map(int, begin_date.split('-'))
-        end_y, end_m, end_d = map(int, end_date.split('-'))
-        cur_y, cur_m, cur_d = begin_y, begin_m, begin_d
-
-        def value_to_date(yy, mm, dd):
-            date_int = yy * 10000 + mm * 100 + dd
-            return f'{str(date_int)[:4:]}-{str(date_int)[4:6:]}-{str(date_int)[6::]}'
+        # SQL 에서 기간 그룹 번호 계산 -> 한 번의 순회로 그룹화
+        transactions = dbl.make_report_box(self.branch, self.db, [begin_date, end_date], interval)
+        page_box = group_rows(transactions, begin_date, end_date, interval)
 
-        def get_next_date(yy, mm, dd, interval):
-            return yy if mm + interval <= 12 else yy + 1, mm + interval if mm + interval <= 12 else mm + interval - 12, 1
-
-        receipt_index = 0
-        page_box = {}
-        while value_to_date(cur_y, cur_m, cur_d) <= end_date and receipt_index < len(transactions):
-            nxt_y, nxt_m, nxt_d = get_next_date(cur_y, cur_m, cur_d, interval)
-            nxt_date = min(value_to_date(nxt_y, nxt_m, nxt_d), end_date)
-
-            _date, _branch, _cashflow, _description = transactions[receipt_index]
-            if _date >= nxt_date:
-                cur_y, cur_m, cur_d = nxt_y, nxt_m, nxt_d
-            else:
-                key = f'{value_to_date(cur_y, cur_m, cur_d)}~{nxt_date}'
-                if not key in page_box:
-                    page_box[key] = []
-
-                page_box[key].append(transactions[receipt_index])
-                receipt_index += 1
-
-        time = str(datetime.now().timestamp()).replace('.', '_')
-        dir_path = f'datas/{self.branch.path}_report_{time}'
+        # 브랜치/그룹 단위별 고정 디렉토리 (manifest.json: 그룹별 입력 해시)
+        dir_path = f'datas/{self.branch.path}_report_{interval_label(interval)}'
         os.makedirs(dir_path, exist_ok=True)
 
-        headers = ['DATE', 'BRANCH', 'IN', 'OUT', 'BALANCE', 'DESCRIPTION']
+        jobs = []
         for key in page_box:
             file_path = dir_path + '/' + key
 
-            # 엑셀 장부 출력
-            xl_generator = AccountBookGenerator(page_box[key], headers)
-            xl_generator.make_excel(file_path + '.xlsx')
-
-            # 영수증 출력
+            # 영수증 목록 (DB 에 저장된 실제 파일명 사용)
             image_box = []
-            for _date, _branch, _cashflow, _description in page_box[key]:
-                info = st.make_image_file_name(_date, _branch, _cashflow, _description)
-
-                if info['status']:
-                    for a in ['.png', '.jpg', '.jpeg']:
-                        image_path = f"transactions/{info['tag']}" + a
-                        if os.path.exists(image_path):
-                            image_box.append(image_path)
+            for _date, _branch, _cashflow, _description, _file_name in page_box[key]:
+                if os.path.splitext(_file_name)[1].lower() in image_extensions:
+                    image_box.append(os.path.join(dbl.folder_path, _file_name))
+
+            jobs.append((file_path, page_box[key], image_box))
+
+        # 입력이 바뀐 기간 그룹만 엑셀 장부 + 영수증 PDF 출력 (프로세스 풀)
+        rebuilt, reused, removed, failed = update_report(dir_path, jobs, [begin_date, end_date], workers)
+        print("- Report: {}".format(dir_path))
+        print("- Rebuilt: {}, Reused: {}, Removed: {}, Failed: {}".format(rebuilt, reused, removed, failed))
+        if failed:
+            self.error("!Error:", f"{failed} group(s) could not be written (files open in another program?)")
+        print("...")
 
-            generate_image_pdf(image_box, file_path + '.pdf')
+    # ep [begin~end] [file name], 기간/파일명이 인자로 주어지면 입력 생략
+    def expand_tree(self, list_cmd: list):
+        period = next((arg for arg in list_cmd[1:] if '~' in arg), None)
+        file_name = next((arg for arg in list_cmd[1:] if '~' not in arg), None)
+        if period is None and file_name is None:
+            begin_month = input('Input Begin Month.. (YYYY-MM)').strip()
+            end_month = input('Input End Month.. (YYYY-MM)').strip()
+        else:
+            begin_month, end_month = (period or '~').split('~')
 
-    def expand_tree(self):
-        # 기간 입력
-        begin_month = input('Input Begin Month.. (YYYY-MM)').strip()
+        # 기간 (미입력 시 이번 달)
         if begin_month == '':
             _now = datetime.now()
             begin_month = st.format_month(f'{_now.year}-{_now.month}')
         else:
             begin_month = st.format_month(begin_month)
 
-        end_month = input('Input End Month.. (YYYY-MM)').strip()
         if end_month == '':
             _now = datetime.now()
             end_month = st.format_month(f'{_now.year}-{_now.month}')
         else:
             end_month = st.format_month(end_month)
 
+        if begin_month is None or end_month is None:
+            self.error('!Error:', 'Not valid month format..')
+            return
+
         if begin_month > end_month:
-            print('!Error', 'The Input(Month) must be that Begin Month <= End Month')
+            self.error('!Error', 'The Input(Month) must be that Begin Month <= End Month')
             return
 
         begin_date = begin_month + '-01'
@@ -581,13 +806,23 @@ class Shell:
         end_date = end_month + '-' + f'{end_day + 100}'[1::]
 
         # db 조회
-        transactions = dbl.make_daily_box(self.branch, self.db, [begin_date, end_date])
+        transactions = dbl.make_expand_box(self.branch, self.db, [begin_date, end_date])
 
         if len(transactions) == 0:
-            print("!Error", f"There s no transaction in ('{begin_month}'~'{end_month}')")
+            self.error("!Error", f"There s no transaction in ('{begin_month}'~'{end_month}')")
             return
 
-        # 엑셀 시트 출력
+        # 파일명 (브랜치, 기간은 자동으로 붙음)
+        if file_name is None and period is None:
+            file_name = input('Input File Name.. (default: expand)').strip()
+        file_name = file_name or 'expand'
+        branch_name = self.branch.path.replace('/', '-')
+        file_path = f'datas/{file_name}_{branch_name}_{begin_month}~{end_month}.xlsx'
+        os.makedirs('datas', exist_ok=True)
+
+        # 엑셀 시트 출력 (In / Out / Net)
+        from lib_make_excel import ExpandTreeGenerator
         etg = ExpandTreeGenerator(self.branch, [begin_month, end_month])
-        etg.make_account_book(transactions)
-        etg.make_excel('datas/abc_in.xlsx', 'datas/abc_out.xlsx')
+        etg.make_account_book(transactions, self.db.branch_ids)
+        if not etg.make_excel(file_path):
+            self.failed = True
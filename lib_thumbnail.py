@@ -0,0 +1,116 @@
+from lib_database import file_sha256
+from reportlab.lib.pagesizes import A4
+from PIL import Image
+
+import os
+import sqlite3
+
+cache_dir = 'datas/thumbnails'
+max_cache_bytes = 512 * 1024 * 1024  # 캐시 총 용량 상한, 초과 시 오래 사용하지 않은 썸네일부터 삭제
+thumbnail_dpi = 150
+jpeg_quality = 85
+index_name = 'digests.db'  # 캐시 디렉토리 안의 원본 해시 인덱스
+
+# A4 4분할 칸 크기 (pt), 아래 20pt 는 파일명 영역
+slot_size = (A4[0] / 2, A4[1] / 2 - 20)
+
+
+# 영수증 썸네일 캐시: 키 = 원본 SHA-256 + DPI, 값 = 4분할 칸 크기로 축소/재압축한 JPEG
+# 사용 시각은 파일 mtime 으로 기록 -> 여러 프로세스가 같은 디렉토리를 공유해도 별도 인덱스 불필요
+# 원본 SHA-256 은 (경로, 크기, mtime) 별로 digests.db 에 보관 -> 재실행/풀 작업 프로세스에서 원본을 다시 읽지 않음
+class ThumbnailCache:
+    def __init__(self, path=cache_dir, dpi=thumbnail_dpi, max_bytes=max_cache_bytes):
+        self.path = path
+        self.dpi = dpi
+        self.max_bytes = max_bytes
+        self.digests = {}  # (원본 경로, 크기, mtime) -> SHA-256, 같은 프로세스 내 재해시 방지
+        self.index = None  # digests.db 연결 (프로세스마다 첫 사용 시 생성)
+        os.makedirs(self.path, exist_ok=True)
+
+    # 원본 경로 -> 썸네일 경로 (실패 시 원본 경로)
+    def get(self, image_path):
+        try:
+            thumb_path = os.path.join(self.path, f'{self.digest(image_path)}_{self.dpi}.jpg')
+            if os.path.exists(thumb_path):
+                os.utime(thumb_path)  # LRU 갱신
+            else:
+                self.make_thumbnail(image_path, thumb_path)
+            return thumb_path
+        except Exception:
+            return image_path
+
+    def digest(self, image_path):
+        file_stat = os.stat(image_path)
+        key = (os.path.abspath(image_path), file_stat.st_size, file_stat.st_mtime_ns)
+        if key not in self.digests:
+            self.digests[key] = self.load_digest(key)
+            if self.digests[key] is None:
+                self.digests[key] = file_sha256(image_path)
+                self.save_digest(key, self.digests[key])
+        return self.digests[key]
+
+    def open_index(self):
+        if self.index is None:
+            self.index = sqlite3.connect(os.path.join(self.path, index_name), timeout=30)
+            self.index.execute('''CREATE TABLE IF NOT EXISTS digests (
+                _Path TEXT PRIMARY KEY,
+                _Size INT,
+                _MTime INT,
+                _Sha256 TEXT
+            );''')
+            self.index.commit()
+        return self.index
+
+    # 인덱스를 사용할 수 없으면 (잠금 등) None -> 원본 해시 계산
+    def load_digest(self, key):
+        try:
+            row = self.open_index().execute(
+                "SELECT _Sha256 FROM digests WHERE _Path = ? AND _Size = ? AND _MTime = ?", key).fetchone()
+            return row[0] if row is not None else None
+        except sqlite3.Error:
+            return None
+
+    def save_digest(self, key, digest):
+        try:
+            self.open_index().execute("INSERT OR REPLACE INTO digests VALUES (?, ?, ?, ?)", (*key, digest))
+            self.index.commit()
+        except sqlite3.Error:
+            if self.index is not None:
+                self.index.rollback()
+
+    def make_thumbnail(self, image_path, thumb_path):
+        max_size = (round(slot_size[0] / 72 * self.dpi), round(slot_size[1] / 72 * self.dpi))
+        with Image.open(image_path) as img:
+            img.draft('RGB', max_size)  # JPEG 은 축소 디코딩
+            img.thumbnail(max_size)
+            if img.mode in ('RGBA', 'LA', 'P'):
+                img = img.convert('RGBA')
+                background = Image.new('RGB', img.size, (255, 255, 255))
+                background.paste(img, mask=img.getchannel('A'))
+                img = background
+            elif img.mode != 'RGB':
+                img = img.convert('RGB')
+
+            # 임시 파일에 기록 후 교체 -> 다른 프로세스가 쓰다 만 파일을 읽지 않도록
+            tmp_path = f'{thumb_path}.{os.getpid()}.tmp'
+            img.save(tmp_path, 'JPEG', quality=jpeg_quality, optimize=True)
+            os.replace(tmp_path, thumb_path)
+
+    # 총 용량이 상한을 넘으면 가장 오래 사용하지 않은 썸네일부터 삭제
+    def evict(self):
+        entries = []
+        with os.scandir(self.path) as it:
+            for entry in it:
+                if entry.is_file() and entry.name.endswith('.jpg'):
+                    file_stat = entry.stat()
+                    entries.append((file_stat.st_mtime, file_stat.st_size, entry.path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
@@ -1,5 +1,3 @@
-import matplotlib.pyplot as plt
-from matplotlib.ticker import FuncFormatter
 from prettytable import PrettyTable
 import lib_sanitizer as Df
 import tkinter as tk
@@ -0,0 +1,97 @@
+import lib_database as dbl
+import queue
+import threading
+import os
+
+
+# 영수증 폴더 감시: 외부에서 추가/삭제된 파일을 DB 에 바로 반영
+# - 감시 스레드: 일정 간격으로 폴더를 조회하여 바뀐 파일명을 큐에 적재
+# - 반영 스레드: 파일이 더 이상 들어오지 않을 때까지 (debounce) 모은 후, 별도 DB 연결로 한 번에 반영
+class ReceiptWatcher:
+    def __init__(self, interval=1.0, debounce=0.5, max_queue=1024):
+        self.interval = interval  # 폴더 조회 간격 (초)
+        self.debounce = debounce  # 마지막 변경 후 반영까지 대기 시간 (초)
+        self.events = queue.Queue(maxsize=max_queue)  # 바뀐 파일명
+        self.overflow = threading.Event()  # 큐가 가득 찬 경우 -> 전체 비교로 대체
+        self.stop_event = threading.Event()
+        self.threads = []
+
+        # 상태
+        self.applied = 0  # 반영된 파일 수
+        self.error = None  # 마지막 오류
+
+    def start(self):
+        self.stop_event.clear()
+        self.threads = [
+            threading.Thread(target=self.poll, name='receipt-poller', daemon=True),
+            threading.Thread(target=self.apply, name='receipt-applier', daemon=True)
+        ]
+        for thread in self.threads:
+            thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        for thread in self.threads:
+            thread.join()
+        self.threads = []
+
+    def is_alive(self):
+        return any(thread.is_alive() for thread in self.threads)
+
+    # 폴더의 수정 시각이 바뀐 경우에만 scandir 로 파일 목록 비교
+    def poll(self):
+        folder_mtime, snapshot = None, None
+        while not self.stop_event.is_set():
+            try:
+                mtime = os.stat(dbl.folder_path).st_mtime
+                if mtime != folder_mtime:
+                    with os.scandir(dbl.folder_path) as entries:
+                        current = {entry.name: entry.stat().st_mtime for entry in entries if entry.is_file()}
+
+                    if snapshot is not None:
+                        changed = [name for name in current if snapshot.get(name) != current[name]]
+                        changed += [name for name in snapshot if name not in current]
+                        for name in changed:
+                            try:
+                                self.events.put_nowait(name)
+                            except queue.Full:
+                                self.overflow.set()
+
+                    folder_mtime, snapshot = mtime, current
+            except OSError as e:
+                self.error = e
+
+            self.stop_event.wait(self.interval)
+
+    def apply(self):
+        # sqlite 연결은 스레드 간 공유하지 않음 -> 반영 스레드 전용 연결 (생성 시 한 번 동기화)
+        try:
+            db = dbl.DatabaseController()
+        except Exception as e:
+            self.error = e
+            return
+
+        while not self.stop_event.is_set():
+            try:
+                names = {self.events.get(timeout=self.interval)}
+            except queue.Empty:
+                continue
+
+            # 연속으로 들어오는 파일은 조용해질 때까지 모아서 반영
+            while True:
+                try:
+                    names.add(self.events.get(timeout=self.debounce))
+                except queue.Empty:
+                    break
+
+            try:
+                if self.overflow.is_set():
+                    self.overflow.clear()
+                    ingested, rejected, removed = db.synchronize()
+                else:
+                    ingested, rejected, removed = db.refresh(list(names))
+                self.applied += ingested + rejected + removed
+            except Exception as e:
+                self.error = e
+
+        db.database.close()
@@ -1,20 +1,76 @@
-from lib_shell import *
+from lib_shell import Shell, quit_commands
+import lib_profiler as profiler
+from multiprocessing import freeze_support
+import argparse
+import sys
+
+
+# 배치 모드: 명령을 순서대로 실행, 첫 실패에서 중단 -> 종료 코드 1
+def run_batch(shell, commands):
+    for command in commands:
+        command = command.strip()
+        if not command or command.startswith('#'):
+            continue
+        if command in quit_commands:
+            break
+
+        print(f"{shell.prompt}{command}")
+        if not shell.fetch(command):
+            return 1
+    return 0
+
+
+# 스크립트 파일: 한 줄에 한 명령 (';' 로 여러 명령 가능, '#' 주석)
+def read_script(file_path):
+    with open(file_path, 'r', encoding='utf-8') as f:
+        return [command for line in f for command in line.split(';')]
+
+
+def __main__(argv=None):
+    parser = argparse.ArgumentParser(description='FinanceTree shell')
+    parser.add_argument('-c', dest='commands', help='run ";"-separated commands and exit, e.g. "cd 운영비; rp 2024-01-01~2024-06-30 1m"')
+    parser.add_argument('script', nargs='?', help='run commands from a script file and exit')
+    parser.add_argument('--profile', action='store_true', help='record command/SQL/phase timings (see stats)')
+    args = parser.parse_args(argv)
+
+    if args.profile:
+        profiler.enable()
 
-def __main__():
     try:
+        commands = None
+        if args.commands is not None:
+            commands = args.commands.split(';')
+        elif args.script is not None:
+            commands = read_script(args.script)
+
         shell = Shell()
-        while True:
-            try:
-                command = input(shell.prompt)
-                if len(command):
-                    if command in quit_commands:
-                        break
-                    else:
-                        shell.fetch(command)
-            except:
-                pass
     except Exception as e:
-        print(e)
+        print('!Error:', e)
+        return 1
+
+    if commands is not None:
+        return run_batch(shell, commands)
+
+    while True:
+        try:
+            command = input(shell.prompt)
+        except EOFError:
+            break
+        except KeyboardInterrupt:
+            print()
+            continue
+
+        if len(command):
+            if command in quit_commands:
+                break
+            try:
+                shell.fetch(command)
+            except KeyboardInterrupt:  # 오래 걸리는 명령 (rp, ep, export 등) 중단 -> 프롬프트로 복귀
+                print()
+                continue
+    return 0
+
 
 if __name__ == '__main__':
-    __main__()
+    freeze_support()  # PyInstaller 빌드에서 프로세스 풀 사용
+    sys.exit(__main__())